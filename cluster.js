@@ -0,0 +1,74 @@
+// Multi-process launcher for server.js
+// WEB_CONCURRENCY sets the number of worker processes (default 1, "auto" = one
+// per CPU core). Each worker is a full copy of server.js with its own OpenAI
+// client and database pool, so nothing socket-based is shared across a fork.
+// The primary only supervises: it restarts workers that crash and forwards
+// SIGTERM/SIGINT so each worker can drain and shut down gracefully. Workers
+// that die shortly after starting are restarted with a growing delay, and the
+// primary gives up after repeated boot failures instead of looping forever.
+require('dotenv').config();
+
+const cluster = require('cluster');
+const os = require('os');
+
+const configured = process.env.WEB_CONCURRENCY || '1';
+const workerCount = configured === 'auto'
+    // os.availableParallelism() needs Node 18.14+
+    ? (typeof os.availableParallelism === 'function' ? os.availableParallelism() : os.cpus().length)
+    : Math.max(1, parseInt(configured, 10) || 1);
+
+if (workerCount === 1 || !cluster.isPrimary) {
+    require('./server');
+} else {
+    console.log(`🧩 Starting ${workerCount} server workers (WEB_CONCURRENCY=${configured})`);
+
+    const MIN_UPTIME_MS = 10000;
+    const MAX_RESTART_DELAY_MS = 30000;
+    const MAX_QUICK_FAILURES = 10;
+
+    let shuttingDown = false;
+    let quickFailures = 0;
+    const forkedAt = new Map();
+
+    const forkWorker = () => {
+        if (shuttingDown) {
+            return;
+        }
+        const worker = cluster.fork();
+        forkedAt.set(worker.id, Date.now());
+    };
+
+    for (let i = 0; i < workerCount; i++) {
+        forkWorker();
+    }
+
+    cluster.on('exit', (worker, code, signal) => {
+        const uptime = Date.now() - forkedAt.get(worker.id);
+        forkedAt.delete(worker.id);
+        if (shuttingDown) {
+            return;
+        }
+
+        // A worker that dies right after starting is most likely failing at
+        // boot, so back off instead of re-forking in a tight loop
+        quickFailures = uptime < MIN_UPTIME_MS ? quickFailures + 1 : 0;
+        if (quickFailures >= MAX_QUICK_FAILURES) {
+            console.error(`❌ Workers keep exiting within ${MIN_UPTIME_MS}ms of starting, giving up`);
+            process.exit(1);
+        }
+
+        const delay = quickFailures ? Math.min(1000 * 2 ** (quickFailures - 1), MAX_RESTART_DELAY_MS) : 0;
+        console.error(`⚠️  Worker ${worker.process.pid} exited (${signal || code}), starting a replacement in ${delay}ms`);
+        setTimeout(forkWorker, delay);
+    });
+
+    const shutdown = (signal) => {
+        shuttingDown = true;
+        console.log(`🛑 ${signal} received, stopping ${Object.keys(cluster.workers).length} workers...`);
+        for (const worker of Object.values(cluster.workers)) {
+            worker.process.kill(signal);
+        }
+    };
+    process.once('SIGTERM', () => shutdown('SIGTERM'));
+    process.once('SIGINT', () => shutdown('SIGINT'));
+}
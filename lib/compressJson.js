@@ -0,0 +1,51 @@
+const zlib = require('zlib');
+
+// Gzip JSON responses for clients that accept it.
+// Only res.json() bodies are compressed: static files and streamed responses
+// (e.g. Server-Sent Events) are left alone. Bodies under `minimumSize` bytes
+// are sent as-is since the gzip framing would eat most of the saving.
+// Bodies up to `offloadSize` bytes are compressed inline, which is cheaper than
+// a threadpool round trip; larger ones go to the libuv threadpool so a long
+// reply doesn't stall the event loop for every other connection.
+function compressJson({ minimumSize = 1024, offloadSize = 8192, level = 5 } = {}) {
+  return (req, res, next) => {
+    const acceptEncoding = req.headers['accept-encoding'] || '';
+    if (!/\bgzip\b/i.test(acceptEncoding)) {
+      return next();
+    }
+
+    res.json = (body) => {
+      const text = JSON.stringify(body);
+      if (!res.get('Content-Type')) {
+        res.set('Content-Type', 'application/json');
+      }
+      res.vary('Accept-Encoding');
+
+      const size = text === undefined ? 0 : Buffer.byteLength(text);
+      if (size < minimumSize) {
+        return res.send(text);
+      }
+
+      if (size <= offloadSize) {
+        res.set('Content-Encoding', 'gzip');
+        return res.send(zlib.gzipSync(text, { level }));
+      }
+
+      zlib.gzip(text, { level }, (error, compressed) => {
+        if (error) {
+          res.send(text);
+          return;
+        }
+        res.set('Content-Encoding', 'gzip');
+        res.send(compressed);
+      });
+      return res;
+    };
+
+    next();
+  };
+}
+
+module.exports = {
+  compressJson,
+};
@@ -1,4 +1,5 @@
 const { Pool } = require('pg');
+const { poolSettings } = require('./poolSettings');
 
 const {
   DATABASE_URL,
@@ -34,8 +35,17 @@ if (sslEnabled) {
   baseConfig.ssl = { rejectUnauthorized: false };
 }
 
+Object.assign(baseConfig, poolSettings);
+
 const pool = new Pool(baseConfig);
 
+// An idle pooled connection can be dropped by the server or network at any time;
+// without a listener pg re-throws that as an uncaught error and kills the process.
+// The pool discards the broken client on its own, so just log it.
+pool.on('error', (error) => {
+  console.error('⚠️  Idle Postgres connection error (connection discarded):', error.message);
+});
+
 module.exports = {
   pool,
 };
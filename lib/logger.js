@@ -0,0 +1,31 @@
+// Minimal level-gated console logger.
+// LOG_LEVEL (debug | info | warn | error, default info) is read once at startup;
+// calls below the configured level return before any argument formatting happens.
+// Wrap expensive log arguments in `if (logger.isLevelEnabled('debug'))` so they
+// are not even built when the level is off.
+
+const LEVELS = {
+  debug: 10,
+  info: 20,
+  warn: 30,
+  error: 40,
+};
+
+const configured = (process.env.LOG_LEVEL || 'info').toLowerCase();
+const threshold = LEVELS[configured] ?? LEVELS.info;
+
+function isLevelEnabled(level) {
+  return LEVELS[level] >= threshold;
+}
+
+const logger = {
+  isLevelEnabled,
+  debug: (...args) => { if (LEVELS.debug >= threshold) console.log(...args); },
+  info: (...args) => { if (LEVELS.info >= threshold) console.log(...args); },
+  warn: (...args) => { if (LEVELS.warn >= threshold) console.warn(...args); },
+  error: (...args) => { if (LEVELS.error >= threshold) console.error(...args); },
+};
+
+module.exports = {
+  logger,
+};
@@ -4,11 +4,22 @@ if (!process.env.OPENAI_API_KEY) {
   console.warn('⚠️  OPENAI_API_KEY is not set. OpenAI client will throw if used without a key.');
 }
 
+// Requests go through Node's global fetch, whose dispatcher keeps TCP/TLS
+// connections alive and reuses them across calls, so one shared client per
+// process is all that's needed for connection reuse. The SDK default timeout
+// is 10 minutes; cap it so a stalled upstream call frees the request.
+const OPENAI_TIMEOUT_MS = Number(process.env.OPENAI_TIMEOUT_MS || 60 * 1000);
+const OPENAI_MAX_RETRIES = Number(process.env.OPENAI_MAX_RETRIES || 2);
+// File uploads (up to 20MB) get their own, longer per-request timeout
+const OPENAI_UPLOAD_TIMEOUT_MS = Number(process.env.OPENAI_UPLOAD_TIMEOUT_MS || 10 * 60 * 1000);
+
 const openai = new OpenAI({
-  apiKey: process.env.OPENAI_API_KEY
+  apiKey: process.env.OPENAI_API_KEY,
+  timeout: OPENAI_TIMEOUT_MS,
+  maxRetries: OPENAI_MAX_RETRIES,
 });
 
 module.exports = {
   openai,
+  OPENAI_UPLOAD_TIMEOUT_MS,
 };
-
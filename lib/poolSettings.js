@@ -0,0 +1,21 @@
+// Connection pool tuning shared by every pg Pool in the app.
+//   DB_POOL_MIN        connections kept open even when idle (default 5)
+//   DB_POOL_MAX        upper bound on open connections (default 25)
+//   DB_POOL_RECYCLE    seconds before a connection is retired and replaced (default 3600),
+//                      so long-lived sockets don't silently die behind NAT/proxy timeouts
+//   DB_POOL_IDLE_MS    close idle connections above DB_POOL_MIN after this long (default 300000)
+//   DB_POOL_ACQUIRE_MS give up waiting for a free connection after this long (default 5000)
+
+const poolSettings = Object.freeze({
+  min: Number(process.env.DB_POOL_MIN || 5),
+  max: Number(process.env.DB_POOL_MAX || 25),
+  maxLifetimeSeconds: Number(process.env.DB_POOL_RECYCLE || 3600),
+  idleTimeoutMillis: Number(process.env.DB_POOL_IDLE_MS || 300000),
+  connectionTimeoutMillis: Number(process.env.DB_POOL_ACQUIRE_MS || 5000),
+});
+
+console.log('🗄️  Postgres pool settings:', poolSettings);
+
+module.exports = {
+  poolSettings,
+};
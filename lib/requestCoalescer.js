@@ -0,0 +1,37 @@
+const crypto = require('crypto');
+
+// Share one upstream call between concurrent identical requests: while a call
+// for `key` is in flight, later callers await its promise instead of starting
+// their own, so a double submit costs one round trip and adds one turn to the
+// conversation. The entry is dropped as soon as the call settles, so nothing
+// is ever served after the fact.
+
+const inflight = new Map();
+
+// Hash the identifying parts into a fixed-size key so long prompts don't
+// become long Map keys
+function requestKey(parts) {
+  return crypto.createHash('sha256').update(parts.join('\u0000')).digest('base64');
+}
+
+function coalesce(key, fn) {
+  const pending = inflight.get(key);
+  if (pending) {
+    return pending;
+  }
+
+  const promise = Promise.resolve()
+    .then(fn)
+    .finally(() => inflight.delete(key));
+  inflight.set(key, promise);
+  return promise;
+}
+
+const RequestCoalescer = {
+  requestKey,
+  coalesce,
+};
+
+module.exports = {
+  RequestCoalescer,
+};
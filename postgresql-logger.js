@@ -1,4 +1,7 @@
+const fs = require('fs');
+const path = require('path');
 const { Pool } = require('pg');
+const { poolSettings } = require('./lib/poolSettings');
 
 class PostgreSQLAccessLogger {
     constructor(options = {}) {
@@ -14,7 +17,15 @@ class PostgreSQLAccessLogger {
             database: options.database || process.env.PGDATABASE || process.env.DB_NAME,
             user: options.user || process.env.PGUSER || process.env.DB_USER,
             password: options.password || process.env.PGPASSWORD || process.env.DB_PASSWORD,
-            ssl: sslConfig
+            ssl: sslConfig,
+            // This pool also backs the session store, so it serves every request
+            ...poolSettings
+        });
+
+        // Idle connections dropped by the server/network must not crash the process;
+        // the pool discards the broken client itself
+        this.pool.on('error', (error) => {
+            console.error('Idle PostgreSQL connection error (connection discarded):', error.message);
         });
         
         this.enableConsole = options.enableConsole || false;
@@ -291,8 +302,6 @@ class PostgreSQLAccessLogger {
                 console.log('Users table does not exist, creating it...');
                 
                 // Read and execute the migration SQL
-                const fs = require('fs');
-                const path = require('path');
                 const migrationSQL = fs.readFileSync(path.join(__dirname, 'database', 'migrate-create-users-table.sql'), 'utf8');
                 
                 await this.pool.query(migrationSQL);
@@ -0,0 +1,213 @@
+const readline = require('readline');
+const { Readable } = require('stream');
+const { toFile } = require('openai');
+const { openai, OPENAI_UPLOAD_TIMEOUT_MS } = require('../lib/openai');
+const { logger } = require('../lib/logger');
+
+// Offline workloads go through OpenAI's Batch API (half price, 24h window)
+// instead of the real-time ChatKit path, so bulk jobs don't compete with chat
+// traffic for the same rate limits. Batch requests are plain Responses API calls
+// (no ChatKit session), so the model is set here.
+const BATCH_MODEL = process.env.OPENAI_BATCH_MODEL || 'gpt-4o-mini';
+const BATCH_MAX_REQUESTS = 50000;
+// Request bodies for this route are parsed with their own limit (see server.js)
+// instead of the global 100kb one, which would cap a batch at a few thousand
+// short prompts. In practice the body size, not BATCH_MAX_REQUESTS, is what
+// bounds large batches of long prompts.
+const BATCH_BODY_LIMIT = process.env.CHATKIT_BATCH_BODY_LIMIT || '20mb';
+
+// Results are returned a page at a time (?after=<custom_id>&limit=<n>), so a
+// 50,000-request batch is never read or held in memory as a whole.
+const BATCH_RESULTS_PAGE_MAX = 1000;
+
+// A completed batch never changes, so its metadata (status, counts, file ids;
+// no results) is kept per batch id and paging through the results doesn't
+// call batches.retrieve each time. Map insertion order gives oldest-first
+// eviction.
+const COMPLETED_BATCH_CACHE_MAX = 1000;
+const completedBatches = new Map();
+
+// Validate { requests: [{ text, custom_id? }] } and build the batch JSONL.
+// Returns { error } for a malformed body.
+function buildBatchInput(body) {
+  const { requests } = body || {};
+  if (!Array.isArray(requests) || requests.length === 0) {
+    return { error: "requests must be a non-empty array" };
+  }
+  if (requests.length > BATCH_MAX_REQUESTS) {
+    return { error: `A batch can contain at most ${BATCH_MAX_REQUESTS} requests` };
+  }
+
+  const seen = new Set();
+  const lines = [];
+  for (let i = 0; i < requests.length; i++) {
+    const item = requests[i] || {};
+    if (typeof item.text !== 'string' || !item.text) {
+      return { error: `requests[${i}].text is required` };
+    }
+    const customId = item.custom_id === undefined ? `request-${i}` : item.custom_id;
+    if (typeof customId !== 'string' || !customId || seen.has(customId)) {
+      return { error: `requests[${i}].custom_id must be a unique non-empty string` };
+    }
+    seen.add(customId);
+    lines.push(JSON.stringify({
+      custom_id: customId,
+      method: "POST",
+      url: "/v1/responses",
+      body: { model: BATCH_MODEL, input: item.text },
+    }));
+  }
+
+  return { jsonl: lines.join("\n"), count: lines.length };
+}
+
+// Collect the assistant text from a raw /v1/responses body
+function responseText(body) {
+  const parts = [];
+  for (const item of body?.output || []) {
+    for (const content of item?.content || []) {
+      if (content?.type === 'output_text' && content.text) parts.push(content.text);
+    }
+  }
+  return parts.join("");
+}
+
+function parseBatchRow(line) {
+  const row = JSON.parse(line);
+  return {
+    custom_id: row.custom_id,
+    text: row.response?.status_code === 200 ? responseText(row.response.body) : null,
+    error: row.error || (row.response?.status_code !== 200 ? row.response?.body?.error || null : null),
+  };
+}
+
+// Stream the result rows of a completed batch: successes from the output file,
+// then failed requests from the error file, so a failure doesn't silently drop
+// out. Files are read line by line and the download stops as soon as the
+// caller stops iterating.
+async function* batchResultRows(batch) {
+  for (const fileId of [batch.output_file_id, batch.error_file_id]) {
+    if (!fileId) continue;
+    const content = await openai.files.content(fileId);
+    const input = Readable.fromWeb(content.body);
+    try {
+      for await (const line of readline.createInterface({ input, crlfDelay: Infinity })) {
+        if (line.trim()) yield parseBatchRow(line);
+      }
+    } finally {
+      input.destroy();
+    }
+  }
+}
+
+// One page of results: up to `limit` rows following the row whose custom_id is
+// `after` (from the start when it is omitted). next_after is the cursor for the
+// following page, or null on the last one.
+async function readBatchResultsPage(batch, after, limit) {
+  const results = [];
+  let skipping = Boolean(after);
+  for await (const row of batchResultRows(batch)) {
+    if (skipping) {
+      skipping = row.custom_id !== after;
+      continue;
+    }
+    if (results.length === limit) {
+      return { results, next_after: results[results.length - 1].custom_id };
+    }
+    results.push(row);
+  }
+  return { results, next_after: null };
+}
+
+// POST /api/chatkit/batch -> { success, batch_id, status, request_count }
+module.exports.chatkitBatchCreate = async (req, res) => {
+  try {
+    const input = buildBatchInput(req.body);
+    if (input.error) {
+      return res.status(400).json({ error: input.error });
+    }
+
+    const file = await openai.files.create({
+      file: await toFile(Buffer.from(input.jsonl, 'utf8'), 'chatkit-batch.jsonl'),
+      purpose: "batch",
+    }, { timeout: OPENAI_UPLOAD_TIMEOUT_MS });
+    const batch = await openai.batches.create({
+      input_file_id: file.id,
+      endpoint: "/v1/responses",
+      completion_window: "24h",
+      metadata: { user_id: String(req.session?.user?.id || '') },
+    });
+
+    // Only the user who created a batch may read it back
+    if (!Array.isArray(req.session.batchIds)) req.session.batchIds = [];
+    req.session.batchIds.push(batch.id);
+
+    logger.info(`[chatkit.batch] Created batch ${batch.id} with ${input.count} requests`);
+    return res.json({ success: true, batch_id: batch.id, status: batch.status, request_count: input.count });
+  } catch (err) {
+    logger.error("[/api/chatkit/batch] ERROR:", err?.stack || err);
+    return res.status(err?.status || 500).json({
+      error: err?.error?.message || err?.message || "chatkit_batch_error",
+    });
+  }
+};
+
+// GET /api/chatkit/batch/:batchId?after=&limit=
+//   -> { success, batch_id, status, request_counts, results?, next_after? }
+// results (one page, at most BATCH_RESULTS_PAGE_MAX rows) and next_after are
+// only present once the batch has completed.
+module.exports.chatkitBatchStatus = async (req, res) => {
+  try {
+    const { batchId } = req.params;
+    if (!Array.isArray(req.session?.batchIds) || !req.session.batchIds.includes(batchId)) {
+      return res.status(404).json({ error: "Batch not found" });
+    }
+
+    const { after } = req.query;
+    const limit = req.query.limit === undefined ? BATCH_RESULTS_PAGE_MAX : Number(req.query.limit);
+    if (!Number.isInteger(limit) || limit < 1 || limit > BATCH_RESULTS_PAGE_MAX) {
+      return res.status(400).json({ error: `limit must be an integer between 1 and ${BATCH_RESULTS_PAGE_MAX}` });
+    }
+    if (after !== undefined && (typeof after !== 'string' || !after)) {
+      return res.status(400).json({ error: "after must be a custom_id" });
+    }
+
+    let batch = completedBatches.get(batchId);
+    if (!batch) {
+      const retrieved = await openai.batches.retrieve(batchId);
+      batch = {
+        id: retrieved.id,
+        status: retrieved.status,
+        request_counts: retrieved.request_counts,
+        output_file_id: retrieved.output_file_id,
+        error_file_id: retrieved.error_file_id,
+      };
+      if (batch.status === 'completed') {
+        completedBatches.set(batchId, batch);
+        if (completedBatches.size > COMPLETED_BATCH_CACHE_MAX) {
+          completedBatches.delete(completedBatches.keys().next().value);
+        }
+      }
+    }
+
+    const reply = {
+      success: true,
+      batch_id: batch.id,
+      status: batch.status,
+      request_counts: batch.request_counts,
+    };
+
+    if (batch.status === 'completed') {
+      Object.assign(reply, await readBatchResultsPage(batch, after, limit));
+    }
+
+    return res.json(reply);
+  } catch (err) {
+    logger.error("[/api/chatkit/batch/:batchId] ERROR:", err?.stack || err);
+    return res.status(err?.status || 500).json({
+      error: err?.error?.message || err?.message || "chatkit_batch_error",
+    });
+  }
+};
+
+module.exports.BATCH_BODY_LIMIT = BATCH_BODY_LIMIT;
@@ -1,18 +1,96 @@
-const OpenAI = require("openai");
 const { openai } = require('../lib/openai');
+const { logger } = require('../lib/logger');
+const { RequestCoalescer } = require('../lib/requestCoalescer');
 
-// Helper to get the files client regardless of API surface
-function getVectorStoreFilesClient() {
-  if (openai?.vectorStores?.files?.list) return openai.vectorStores.files;
-  if (openai?.beta?.vectorStores?.files?.list) return openai.beta.vectorStores.files;
-  const direct = new OpenAI({ apiKey: process.env.OPENAI_API_KEY });
-  return direct.vectorStores.files;
+// Tool descriptors shared by every request. The SDK only serializes them, so a
+// single frozen instance per tool type replaces per-file object literals.
+const TOOL_BY_TYPE = Object.freeze({
+  file_search: Object.freeze({ type: 'file_search' }),
+  code_interpreter: Object.freeze({ type: 'code_interpreter' }),
+});
+const ATTACHMENT_TOOLS_BY_TYPE = Object.freeze({
+  file_search: Object.freeze([TOOL_BY_TYPE.file_search]),
+  code_interpreter: Object.freeze([TOOL_BY_TYPE.code_interpreter]),
+});
+
+// Which retrieval resources a message carries, decided once per request
+const RetrievalMode = Object.freeze({
+  NONE: 'none',
+  VECTOR_STORE: 'vector_store',
+  ATTACHMENTS: 'attachments',
+  VECTOR_STORE_AND_ATTACHMENTS: 'vector_store_and_attachments',
+});
+
+const NO_ATTACHMENTS = Object.freeze({ attachments: Object.freeze([]), tools: Object.freeze([]) });
+
+function retrievalModeFor(vectorStoreId, fileIds) {
+  if (vectorStoreId) {
+    return fileIds.length ? RetrievalMode.VECTOR_STORE_AND_ATTACHMENTS : RetrievalMode.VECTOR_STORE;
+  }
+  return fileIds.length ? RetrievalMode.ATTACHMENTS : RetrievalMode.NONE;
+}
+
+// Build per-file attachments (tool chosen by category) and collect the distinct
+// tool types needed for the request in a single pass.
+// Prefer client-provided staged_files (includes metadata/category) to choose tools
+function buildAttachments(fileIds, stagedFiles) {
+  const metaById = new Map();
+  for (const f of stagedFiles) {
+    if (f && typeof f.file_id === 'string' && f.file_id) metaById.set(f.file_id, f);
+  }
+
+  const attachments = [];
+  const toolTypes = new Set();
+  for (const id of fileIds) {
+    const f = metaById.get(id) || {};
+    const categoryRaw = (f.category || f.file_category || '').toString();
+    const category = categoryRaw.toLowerCase().replace(/[^a-z0-9]+/g, '_');
+    const type = category === 'code_interpreter' ? 'code_interpreter' : 'file_search';
+    toolTypes.add(type);
+    attachments.push({ file_id: id, tools: ATTACHMENT_TOOLS_BY_TYPE[type] });
+  }
+  return { attachments, tools: Array.from(toolTypes, type => TOOL_BY_TYPE[type]) };
+}
+
+function vectorStoreResources(vectorStoreId) {
+  return { file_search: { vector_store_ids: [vectorStoreId] } };
 }
 
+// One ChatKit payload shape per retrieval mode. Attachments are inlined on the
+// input message (preferred shape for ChatKit); the session's vector store goes
+// in tool_resources.
+const PAYLOAD_BUILDERS = Object.freeze({
+  [RetrievalMode.NONE]: ({ sessionId, text }) => ({
+    session_id: sessionId,
+    input: [{ role: "user", content: text }],
+  }),
+  [RetrievalMode.VECTOR_STORE]: ({ sessionId, text, vectorStoreId }) => ({
+    session_id: sessionId,
+    input: [{ role: "user", content: text }],
+    tool_resources: vectorStoreResources(vectorStoreId),
+  }),
+  [RetrievalMode.ATTACHMENTS]: ({ sessionId, text, attachments, tools }) => ({
+    session_id: sessionId,
+    tools,
+    input: [{ role: "user", content: text, attachments }],
+  }),
+  [RetrievalMode.VECTOR_STORE_AND_ATTACHMENTS]: ({ sessionId, text, vectorStoreId, attachments, tools }) => ({
+    session_id: sessionId,
+    tools,
+    input: [{ role: "user", content: text, attachments }],
+    tool_resources: vectorStoreResources(vectorStoreId),
+  }),
+});
+
+// Files client for whichever API surface this SDK exposes, resolved once at load
+const vectorStoreFilesClient = openai?.vectorStores?.files?.list
+  ? openai.vectorStores.files
+  : openai?.beta?.vectorStores?.files;
+
 // Helper to list all file ids in a vector store (handles pagination)
 async function listVectorStoreFileIds(vectorStoreId) {
   if (!vectorStoreId) return [];
-  const filesClient = getVectorStoreFilesClient();
+  const filesClient = vectorStoreFilesClient;
   const ids = [];
   let cursor = undefined;
   do {
@@ -28,120 +106,246 @@ async function listVectorStoreFileIds(vectorStoreId) {
   return ids;
 }
 
-module.exports.chatkitMessage = async (req, res) => {
-  try {
-    const { text, staged_file_ids, staged_files } = req.body || {};
-    const sessionId = req.session?.chatkitSessionId;
-    const vectorStoreId =
-      req.session?.vectorStoreId || req.session?.threadVectorStoreId || null;
-    // We will attach files directly by file_id instead of using vector store ids
-
-    if (!text || !sessionId) {
-      return res.status(400).json({ error: "Missing text or session" });
-    }
+const QUERY_TRUE = new Set(['1', 'true']);
 
-    // Collect candidate file ids: client-provided + any unsent from the session
-    const clientFileIds = Array.isArray(staged_file_ids) ? staged_file_ids : [];
-    const sessionUnsent = Array.isArray(req.session?.unsentFileIds) ? req.session.unsentFileIds : [];
-    const allCandidateIds = Array.from(new Set([ ...clientFileIds, ...sessionUnsent ]));
-
-    // Build attachments with tool permissions per file
-    // Prefer client-provided staged_files (includes metadata/category) to choose tools
-    const filesWithMeta = Array.isArray(staged_files) ? staged_files : [];
-    const metaById = new Map(filesWithMeta
-      .filter(f => f && typeof f.file_id === 'string' && f.file_id)
-      .map(f => [f.file_id, f]));
-
-    let attachments = [];
-
-    attachments = allCandidateIds.map(id => {
-      const f = metaById.get(id) || {};
-      const categoryRaw = (f.category || f.file_category || '').toString();
-      const category = categoryRaw.toLowerCase().replace(/[^a-z0-9]+/g, '_');
-      const tools = category === 'code_interpreter'
-        ? [{ type: 'code_interpreter' }]
-        : [{ type: 'file_search' }];
-      return { file_id: id, tools };
-    });
+// Upper bounds on a single message. express.json() already refuses bodies over
+// its 100kb limit from Content-Length before reading them; these keep a body
+// that fits under it from fanning out into a huge prompt or attachment list.
+const MAX_TEXT_LENGTH = 32000;
+const MAX_STAGED_FILES = 32;
 
-    // Build tools set based on attachments
-    const toolTypes = new Set();
-    for (const att of attachments) {
-      for (const t of att.tools || []) {
-        if (t?.type) toolTypes.add(t.type);
-      }
-    }
-    const tools = Array.from(toolTypes).map(type => ({ type }));
-
-    // Build input message with inlined attachments (preferred shape for ChatKit)
-    const inputMessage = {
-      role: "user",
-      content: text,
-      ...(attachments.length
-        ? {
-            attachments: attachments.map(a => ({
-              file_id: a.file_id,
-              tools: Array.isArray(a.tools) && a.tools.length ? a.tools : [{ type: "file_search" }],
-            })),
-          }
-        : {}),
-    };
-
-    // Send the message through ChatKit with per-message attachments
-    const payload = {
-      session_id: sessionId,
-      ...(tools.length ? { tools } : {}),
-      input: [inputMessage],
-      ...(vectorStoreId
-        ? { tool_resources: { file_search: { vector_store_ids: [vectorStoreId] } } }
-        : {}),
-    };
-
-    // Log the payload being sent to OpenAI (for debugging)
-    console.log('[chatkit.message] 📤 Sending to OpenAI ChatKit API:');
-    console.log('[chatkit.message] 📤 Session ID:', sessionId);
-    console.log('[chatkit.message] 📤 File IDs in attachments:', attachments.map(a => a.file_id));
-    console.log('[chatkit.message] 📤 Tools:', tools);
+// Validate and normalize the message body in one place.
+// Returns { error } for a malformed body, otherwise the typed fields.
+function parseMessageBody(body) {
+  const { text, staged_file_ids, staged_files, include_raw } = body || {};
+
+  if (typeof text !== 'string' || !text) {
+    return { error: "Missing text or session" };
+  }
+  if (text.length > MAX_TEXT_LENGTH) {
+    return { error: `text must be at most ${MAX_TEXT_LENGTH} characters` };
+  }
+  if (staged_file_ids !== undefined && staged_file_ids !== null &&
+      !(Array.isArray(staged_file_ids) && staged_file_ids.every(id => typeof id === 'string'))) {
+    return { error: "staged_file_ids must be an array of strings" };
+  }
+  if (staged_files !== undefined && staged_files !== null && !Array.isArray(staged_files)) {
+    return { error: "staged_files must be an array" };
+  }
+  if ((staged_file_ids?.length || 0) > MAX_STAGED_FILES || (staged_files?.length || 0) > MAX_STAGED_FILES) {
+    return { error: `At most ${MAX_STAGED_FILES} staged files can be sent with a message` };
+  }
+  if (include_raw !== undefined && typeof include_raw !== 'boolean') {
+    return { error: "include_raw must be a boolean" };
+  }
+
+  return {
+    text,
+    stagedFileIds: staged_file_ids || [],
+    stagedFiles: staged_files || [],
+    includeRaw: include_raw === true,
+  };
+}
+
+// Build the ChatKit request for the current session from the client body.
+// Returns { error } when the body is invalid or there is no ChatKit session.
+function buildChatkitRequest(req) {
+  const message = parseMessageBody(req.body);
+  if (message.error) {
+    return message;
+  }
+  const { text, stagedFileIds, stagedFiles } = message;
+  const includeRaw = message.includeRaw || QUERY_TRUE.has(req.query?.include_raw);
+  const sessionId = req.session?.chatkitSessionId;
+  const vectorStoreId =
+    req.session?.vectorStoreId || req.session?.threadVectorStoreId || null;
+  // We will attach files directly by file_id instead of using vector store ids
+
+  if (!sessionId) {
+    return { error: "Missing text or session" };
+  }
+
+  // Collect candidate file ids: client-provided + any unsent from the session
+  const sessionUnsent = Array.isArray(req.session?.unsentFileIds) ? req.session.unsentFileIds : [];
+  const allCandidateIds = Array.from(new Set([ ...stagedFileIds, ...sessionUnsent ]));
+
+  const mode = retrievalModeFor(vectorStoreId, allCandidateIds);
+  const { attachments, tools } = allCandidateIds.length
+    ? buildAttachments(allCandidateIds, stagedFiles)
+    : NO_ATTACHMENTS;
+  const payload = PAYLOAD_BUILDERS[mode]({ sessionId, text, vectorStoreId, attachments, tools });
+
+  // Log the payload being sent to OpenAI (for debugging, LOG_LEVEL=debug)
+  if (logger.isLevelEnabled('debug')) {
+    logger.debug('[chatkit.message] 📤 Sending to OpenAI ChatKit API:');
+    logger.debug('[chatkit.message] 📤 Session ID:', sessionId);
+    logger.debug('[chatkit.message] 📤 File IDs in attachments:', attachments.map(a => a.file_id));
+    logger.debug('[chatkit.message] 📤 Tools:', tools);
     if (vectorStoreId) {
-      console.log('[chatkit.message] 📤 tool_resources.file_search.vector_store_ids:', [vectorStoreId]);
+      logger.debug('[chatkit.message] 📤 tool_resources.file_search.vector_store_ids:', [vectorStoreId]);
     }
-    console.log('[chatkit.message] 📤 Input message:', JSON.stringify(inputMessage, null, 2));
-
-    // Create a response in the existing ChatKit session via SDK Sessions API
-    const chatkitSessionsResponsesCreate = openai?.beta?.chatkit?.sessions?.responses?.create;
-    if (typeof chatkitSessionsResponsesCreate !== 'function') {
-      const err = new Error('ChatKit Sessions API is unavailable on this SDK: expected openai.beta.chatkit.sessions.responses.create');
-      err.status = 500;
-      throw err;
+    logger.debug('[chatkit.message] 📤 Input message:', JSON.stringify(payload.input[0], null, 2));
+  }
+
+  // Identifies this exact message (text and files) in this session, so a
+  // double submit can share the in-flight call
+  const requestKey = RequestCoalescer.requestKey([sessionId, vectorStoreId || '', text, ...allCandidateIds]);
+
+  return { payload, allCandidateIds, includeRaw, requestKey };
+}
+
+// The SDK surface is fixed for the life of the process, so look up the ChatKit
+// Sessions API once at load instead of probing the client on every request
+const sessionResponses = openai?.beta?.chatkit?.sessions?.responses;
+const createSessionResponse = typeof sessionResponses?.create === 'function'
+  ? sessionResponses.create.bind(sessionResponses)
+  : null;
+
+if (!createSessionResponse) {
+  logger.warn('[chatkit.message] ChatKit Sessions API is unavailable on this SDK; /api/chatkit/message will return 500');
+}
+
+// Posting a message adds a turn to the ChatKit conversation, so a retry after a
+// timeout could add the same turn again. These calls are never retried.
+const SESSION_RESPONSE_OPTIONS = Object.freeze({ maxRetries: 0 });
+
+function getSessionResponsesCreate() {
+  if (!createSessionResponse) {
+    const err = new Error('ChatKit Sessions API is unavailable on this SDK: expected openai.beta.chatkit.sessions.responses.create');
+    err.status = 500;
+    throw err;
+  }
+  return createSessionResponse;
+}
+
+// Mark any session-tracked unsent file ids that were included as sent now
+async function markFilesSent(req, allCandidateIds) {
+  try {
+    if (Array.isArray(req.session.unsentFileIds)) {
+      const sentIds = new Set(allCandidateIds);
+      req.session.unsentFileIds = req.session.unsentFileIds.filter(id => !sentIds.has(id));
     }
-    const reply = await openai.beta.chatkit.sessions.responses.create(payload);
+    if (!Array.isArray(req.session.sentFileIds)) req.session.sentFileIds = [];
+    req.session.sentFileIds = Array.from(new Set([ ...req.session.sentFileIds, ...allCandidateIds ]));
+    if (typeof req.session.save === 'function') {
+      await new Promise((resolve, reject) => req.session.save(err => (err ? reject(err) : resolve())));
+    }
+  } catch (trackErr) {
+    logger.warn('[chatkit.message] Failed to update sent/unsent file tracking:', trackErr?.message);
+  }
+}
 
-    // Mark any session-tracked unsent file ids that were included as sent now
-    try {
-      if (Array.isArray(req.session.unsentFileIds)) {
-        const sentIds = new Set(allCandidateIds);
-        req.session.unsentFileIds = req.session.unsentFileIds.filter(id => !sentIds.has(id));
-      }
-      if (!Array.isArray(req.session.sentFileIds)) req.session.sentFileIds = [];
-      req.session.sentFileIds = Array.from(new Set([ ...req.session.sentFileIds, ...allCandidateIds ]));
-      if (typeof req.session.save === 'function') {
-        await new Promise((resolve, reject) => req.session.save(err => (err ? reject(err) : resolve())));
-      }
-    } catch (trackErr) {
-      console.warn('[chatkit.message] Failed to update sent/unsent file tracking:', trackErr?.message);
+// Returns { success, text, response_id }. The full OpenAI response object is
+// only echoed back as `raw` when requested with include_raw: true in the body or
+// ?include_raw=1 on the URL, so the default reply stays small and is not
+// re-serialized in full.
+module.exports.chatkitMessage = async (req, res) => {
+  try {
+    const request = buildChatkitRequest(req);
+    if (request.error) {
+      return res.status(400).json({ error: request.error });
     }
+    const { payload, allCandidateIds, includeRaw, requestKey } = request;
+
+    // Create a response in the existing ChatKit session via SDK Sessions API.
+    // Identical requests that arrive while one is in flight (e.g. a double
+    // submit) share that call instead of each hitting OpenAI.
+    const createResponse = getSessionResponsesCreate();
+    const reply = await RequestCoalescer.coalesce(requestKey, () => createResponse(payload, SESSION_RESPONSE_OPTIONS));
+
+    await markFilesSent(req, allCandidateIds);
 
     const out =
       reply.output_text ??
       reply.output?.[0]?.content?.[0]?.text?.value ??
       "";
 
-    return res.json({ success: true, text: out, response_id: reply.id });
+    return res.json({
+      success: true,
+      text: out,
+      response_id: reply.id,
+      ...(includeRaw ? { raw: reply } : {}),
+    });
   } catch (err) {
-    console.error("[/api/chatkit/message] ERROR:", err?.stack || err);
+    logger.error("[/api/chatkit/message] ERROR:", err?.stack || err);
     return res.status(err?.status || 500).json({
       error: err?.error?.message || err?.message || "chatkit_message_error",
     });
   }
 };
 
+// Streaming variant: forwards text deltas as Server-Sent Events as soon as they
+// arrive instead of buffering the whole reply, so the first token reaches the
+// client without waiting for generation to finish.
+//   data: {"delta": "..."}          one per output_text delta
+//   data: {"response_id": "..."}    once the response completes
+//   data: [DONE]                    end of stream
+module.exports.chatkitMessageStream = async (req, res) => {
+  // Stop pulling from OpenAI if the browser goes away, including while the
+  // upstream call is still being set up. This listens on res: express.json()
+  // has already consumed the body, so req is destroyed by now and never emits
+  // 'close' for a disconnect.
+  let clientGone = false;
+  let stream;
+  res.on('close', () => {
+    if (res.writableFinished) return;
+    clientGone = true;
+    stream?.controller?.abort?.();
+  });
+
+  let request;
+  try {
+    request = buildChatkitRequest(req);
+    if (request.error) {
+      return res.status(400).json({ error: request.error });
+    }
+    stream = await getSessionResponsesCreate()({ ...request.payload, stream: true }, SESSION_RESPONSE_OPTIONS);
+  } catch (err) {
+    logger.error("[/api/chatkit/message/stream] ERROR:", err?.stack || err);
+    return res.status(err?.status || 500).json({
+      error: err?.error?.message || err?.message || "chatkit_message_error",
+    });
+  }
+
+  if (clientGone) {
+    stream.controller?.abort?.();
+    return;
+  }
+
+  res.status(200);
+  res.set({
+    'Content-Type': 'text/event-stream',
+    'Cache-Control': 'no-cache',
+    'Connection': 'keep-alive',
+    'X-Accel-Buffering': 'no',
+  });
+  res.flushHeaders();
+
+  let completed = false;
+  let failed = false;
+  try {
+    for await (const event of stream) {
+      if (clientGone) break;
+      if (event?.type === 'response.output_text.delta' && event.delta) {
+        res.write(`data: ${JSON.stringify({ delta: event.delta })}\n\n`);
+      } else if (event?.type === 'response.completed') {
+        completed = true;
+        res.write(`data: ${JSON.stringify({ response_id: event.response?.id ?? null })}\n\n`);
+      }
+    }
+  } catch (err) {
+    failed = true;
+    if (!clientGone) {
+      logger.error("[/api/chatkit/message/stream] STREAM ERROR:", err?.stack || err);
+      res.write(`data: ${JSON.stringify({ error: err?.error?.message || err?.message || "chatkit_message_error" })}\n\n`);
+    }
+  }
+
+  // Like the buffered handler, only mark files as sent once the reply has
+  // completed, so a failed stream leaves them queued for the next message
+  if (completed) {
+    await markFilesSent(req, request.allCandidateIds);
+  }
+  if (!failed && !clientGone) res.write("data: [DONE]\n\n");
+  res.end();
+};
@@ -1,3 +1,5 @@
+const fs = require('fs');
+const path = require('path');
 const {
   buildAgent,
   Runner,
@@ -5,16 +7,14 @@ const {
   codeInterpreterTool,
   hostedMcpTool,
 } = require('@openai/agents');
-const { OpenAI } = require('openai');
+const { openai } = require('./lib/openai');
 const { runGuardrails } = require('@openai/guardrails');
 
 // Log SDK version for debugging
 try {
   // Use require.resolve to get the package entry point, then traverse up to find package.json
   const packagePath = require.resolve('@openai/agents');
-  const fs = require('fs');
-  const path = require('path');
-  
+
   // Traverse up from the entry point (e.g., dist/index.js) to find package.json
   let currentDir = path.dirname(packagePath);
   let packageJsonPath = null;
@@ -48,9 +48,9 @@ try {
   console.warn('@openai/agents-openai not available, file_search will not be enabled:', e?.message);
 }
 
-// CRITICAL: Create OpenAI client at module scope to ensure it's reused across requests
+// CRITICAL: Use the process-wide OpenAI client so it's reused across requests
 // This ensures state persistence works correctly - a new client per request would break memory
-const client = new OpenAI({ apiKey: process.env.OPENAI_API_KEY });
+const client = openai;
 
 // Log client creation (only once when module loads)
 if (!global._openaiClientLogged) {
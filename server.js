@@ -1,20 +1,27 @@
+// Load .env before any module that reads configuration at require time
+require('dotenv').config();
+
 const express = require('express');
 const path = require('path');
 const session = require('express-session');
 const cors = require('cors');
 const AWS = require('aws-sdk');
-const OpenAI = require('openai');
-const { chatkitMessage } = require('./routes/chatkit.message');
+const { chatkitMessage, chatkitMessageStream } = require('./routes/chatkit.message');
+const { chatkitBatchCreate, chatkitBatchStatus, BATCH_BODY_LIMIT } = require('./routes/chatkit.batch');
+const { openai: sharedOpenAI, OPENAI_UPLOAD_TIMEOUT_MS } = require('./lib/openai');
 const { getFileConfig, prepareMessageParts } = require('./services/fileHandler.service');
+const https = require('https');
 const crypto = require('crypto');
 const mime = require('mime-types');
 const LoggingConfig = require('./logging-config');
+const { compressJson } = require('./lib/compressJson');
+const { logger } = require('./lib/logger');
+const { isValidUserType, isValidChatbotStatus } = require('./constants.js');
 const pgSession = require('connect-pg-simple');
 const fs = require('fs').promises;
 const { exec } = require('child_process');
 const { promisify } = require('util');
 const execAsync = promisify(exec);
-require('dotenv').config();
 
 const app = express();
 const PORT = process.env.PORT || 3000;
@@ -244,9 +251,18 @@ const getActiveChatbot = async () => {
     }
 };
 
+// Environment values read on request paths - resolved once at startup because
+// every process.env access is a lookup into the native environment
+const AWS_REGION = process.env.AWS_REGION || 'us-east-1';
+const S3_BUCKET_NAME = process.env.S3_BUCKET_NAME;
+const S3_INGEST_BUCKET = process.env.S3_BUCKET_NAME || process.env.S3_BUCKET;
+const OPENAI_API_KEY = process.env.OPENAI_API_KEY;
+const OPENAI_CHATKIT_PUBLIC_KEY = process.env.OPENAI_CHATKIT_PUBLIC_KEY;
+const OPENAI_CHATKIT_PUBLIC_KEY_LOCAL = process.env.OPENAI_CHATKIT_PUBLIC_KEY_LOCAL;
+
 // Configure AWS
 AWS.config.update({
-    region: process.env.AWS_REGION || 'us-east-1',
+    region: AWS_REGION,
     accessKeyId: process.env.AWS_ACCESS_KEY_ID,
     secretAccessKey: process.env.AWS_SECRET_ACCESS_KEY
 });
@@ -290,15 +306,11 @@ const streamToBuffer = async (stream) => {
     return Buffer.from(stream);
 };
 
-// Lazy OpenAI client initialization - only create when needed
-let openaiClient = null;
+// Shared OpenAI client - every handler reuses the module-level instance from lib/openai
+// so concurrent requests share one client (and its connection pool) instead of each
+// endpoint lazily building its own
 const getOpenAIClient = () => {
-    if (!openaiClient && process.env.OPENAI_API_KEY) {
-        openaiClient = new OpenAI({
-            apiKey: process.env.OPENAI_API_KEY
-        });
-    }
-    return openaiClient;
+    return OPENAI_API_KEY ? sharedOpenAI : null;
 };
 
 
@@ -405,8 +417,14 @@ async function logSessionTermination(req, reason = 'expired') {
 }
 
 // Middleware
-app.use(express.json());
+// Batch submissions are parsed after authentication with their own, larger
+// limit (see the /api/chatkit/batch route); everything else keeps the default
+const jsonParser = express.json();
+const batchJsonParser = express.json({ limit: BATCH_BODY_LIMIT });
+app.use((req, res, next) => (req.path === '/api/chatkit/batch' ? next() : jsonParser(req, res, next)));
 app.use(express.urlencoded({ extended: true }));
+// Gzip JSON API responses over 1KB for clients that accept it
+app.use(compressJson({ minimumSize: 1024, level: 5 }));
 
 // Add X-Robots-Tag header to all responses to prevent search engine indexing
 app.use((req, res, next) => {
@@ -761,7 +779,6 @@ app.post('/auth/login', async (req, res) => {
         }
         
         // Use AWS Cognito for authentication
-        const AWS = require('aws-sdk');
         const cognito = new AWS.CognitoIdentityServiceProvider();
         
         // Calculate SECRET_HASH for client with secret
@@ -901,14 +918,22 @@ app.get('/api/user', (req, res) => {
 // Used when the SDK doesn't expose beta.vectorStores (e.g., SDK v6.5.0)
 // Following OpenAI API: POST https://api.openai.com/v1/vector_stores
 
+// Shared keep-alive agent for the HTTP fallbacks below so repeated calls (e.g.
+// polling indexing status) reuse TLS connections instead of handshaking each time
+const openaiHttpsAgent = new https.Agent({
+    keepAlive: true,
+    maxSockets: 200,
+    maxFreeSockets: 100
+});
+
 async function createVectorStoreViaHTTP(name, apiKey) {
-    const https = require('https');
     
     return new Promise((resolve, reject) => {
         const postData = JSON.stringify({ name });
         
         const options = {
             hostname: 'api.openai.com',
+            agent: openaiHttpsAgent,
             path: '/v1/vector_stores',
             method: 'POST',
             headers: {
@@ -920,9 +945,10 @@ async function createVectorStoreViaHTTP(name, apiKey) {
         };
         
         const req = https.request(options, (res) => {
-            let data = '';
-            res.on('data', (chunk) => { data += chunk; });
+            const chunks = [];
+            res.on('data', (chunk) => { chunks.push(chunk); });
             res.on('end', () => {
+                const data = Buffer.concat(chunks).toString('utf8');
                 if (res.statusCode >= 200 && res.statusCode < 300) {
                     try {
                         const parsed = JSON.parse(data);
@@ -962,11 +988,11 @@ async function createVectorStoreViaHTTP(name, apiKey) {
 }
 
 async function retrieveVectorStoreViaHTTP(vectorStoreId, apiKey) {
-    const https = require('https');
     
     return new Promise((resolve, reject) => {
         const options = {
             hostname: 'api.openai.com',
+            agent: openaiHttpsAgent,
             path: `/v1/vector_stores/${vectorStoreId}`,
             method: 'GET',
             headers: {
@@ -976,9 +1002,10 @@ async function retrieveVectorStoreViaHTTP(vectorStoreId, apiKey) {
         };
         
         const req = https.request(options, (res) => {
-            let data = '';
-            res.on('data', (chunk) => { data += chunk; });
+            const chunks = [];
+            res.on('data', (chunk) => { chunks.push(chunk); });
             res.on('end', () => {
+                const data = Buffer.concat(chunks).toString('utf8');
                 if (res.statusCode >= 200 && res.statusCode < 300) {
                     try {
                         const parsed = JSON.parse(data);
@@ -1017,13 +1044,13 @@ async function retrieveVectorStoreViaHTTP(vectorStoreId, apiKey) {
 }
 
 async function addFileToVectorStoreViaHTTP(vectorStoreId, fileId, apiKey) {
-    const https = require('https');
     
     return new Promise((resolve, reject) => {
         const postData = JSON.stringify({ file_id: fileId });
         
         const options = {
             hostname: 'api.openai.com',
+            agent: openaiHttpsAgent,
             path: `/v1/vector_stores/${vectorStoreId}/files`,
             method: 'POST',
             headers: {
@@ -1035,9 +1062,10 @@ async function addFileToVectorStoreViaHTTP(vectorStoreId, fileId, apiKey) {
         };
         
         const req = https.request(options, (res) => {
-            let data = '';
-            res.on('data', (chunk) => { data += chunk; });
+            const chunks = [];
+            res.on('data', (chunk) => { chunks.push(chunk); });
             res.on('end', () => {
+                const data = Buffer.concat(chunks).toString('utf8');
                 if (res.statusCode >= 200 && res.statusCode < 300) {
                     try {
                         const parsed = JSON.parse(data);
@@ -1078,7 +1106,6 @@ async function addFileToVectorStoreViaHTTP(vectorStoreId, fileId, apiKey) {
 
 // Helper function to list files in a vector store (with HTTP fallback)
 async function listVectorStoreFilesViaHTTP(vectorStoreId, apiKey, limit = 100, order = 'asc', after = null) {
-    const https = require('https');
     
     return new Promise((resolve, reject) => {
         let path = `/v1/vector_stores/${vectorStoreId}/files?limit=${limit}&order=${order}`;
@@ -1088,6 +1115,7 @@ async function listVectorStoreFilesViaHTTP(vectorStoreId, apiKey, limit = 100, o
         
         const options = {
             hostname: 'api.openai.com',
+            agent: openaiHttpsAgent,
             path: path,
             method: 'GET',
             headers: {
@@ -1097,9 +1125,10 @@ async function listVectorStoreFilesViaHTTP(vectorStoreId, apiKey, limit = 100, o
         };
         
         const req = https.request(options, (res) => {
-            let data = '';
-            res.on('data', (chunk) => { data += chunk; });
+            const chunks = [];
+            res.on('data', (chunk) => { chunks.push(chunk); });
             res.on('end', () => {
+                const data = Buffer.concat(chunks).toString('utf8');
                 if (res.statusCode >= 200 && res.statusCode < 300) {
                     try {
                         const parsed = JSON.parse(data);
@@ -1141,7 +1170,7 @@ async function waitUntilVectorStoreFilesCompleted(client, vectorStoreId, fileIds
         return; // Nothing to wait for
     }
     
-    const apiKey = process.env.OPENAI_API_KEY;
+    const apiKey = OPENAI_API_KEY;
     if (!apiKey) {
         console.warn('⚠️ Cannot wait for vector store files: OPENAI_API_KEY not found');
         return;
@@ -1150,7 +1179,7 @@ async function waitUntilVectorStoreFilesCompleted(client, vectorStoreId, fileIds
     const startTime = Date.now();
     const targetFileIds = new Set(fileIds);
     
-    console.log('⏳ Waiting for vector store files to complete ingestion:', {
+    logger.info('⏳ Waiting for vector store files to complete ingestion:', {
         vectorStoreId,
         fileCount: fileIds.length,
         fileIds: fileIds.slice(0, 5).map(id => id.substring(0, 10) + '...') // Log first 5
@@ -1188,7 +1217,7 @@ async function waitUntilVectorStoreFilesCompleted(client, vectorStoreId, fileIds
             
             // If all files are completed, we're done
             if (completedFiles.size === targetFileIds.size) {
-                console.log('✅ All vector store files completed ingestion:', {
+                logger.info('✅ All vector store files completed ingestion:', {
                     vectorStoreId,
                     completedCount: completedFiles.size
                 });
@@ -1197,7 +1226,7 @@ async function waitUntilVectorStoreFilesCompleted(client, vectorStoreId, fileIds
             
             // Log progress
             if (inProgressFiles.length > 0) {
-                console.log('⏳ Vector store files still ingesting:', {
+                logger.info('⏳ Vector store files still ingesting:', {
                     vectorStoreId,
                     completed: completedFiles.size,
                     total: targetFileIds.size,
@@ -1240,25 +1269,27 @@ async function waitUntilVectorStoreFilesCompleted(client, vectorStoreId, fileIds
 async function waitForVectorIndex(client, vectorStoreId, fileId, { timeoutMs = 120000, pollIntervalMs = 1000 } = {}) {
     const start = Date.now();
     
-    // Helper to retrieve vector store file status
-    const retrieveStatus = async () => {
-        if (client.beta?.vectorStores?.files?.retrieve) {
-            return await client.beta.vectorStores.files.retrieve(vectorStoreId, fileId);
-        } else {
-            // Fallback to HTTP API
-            const apiKey = process.env.OPENAI_API_KEY;
-            if (!apiKey) {
-                throw new Error('OPENAI_API_KEY not found for vector store file retrieval');
-            }
-            return await retrieveVectorStoreFileViaHTTP(vectorStoreId, fileId, apiKey);
+    // Helper to retrieve vector store file status. The client's API surface
+    // doesn't change between polls, so the SDK/HTTP choice is made once here
+    // rather than on every iteration.
+    let retrieveStatus;
+    if (client.beta?.vectorStores?.files?.retrieve) {
+        const filesClient = client.beta.vectorStores.files;
+        retrieveStatus = () => filesClient.retrieve(vectorStoreId, fileId);
+    } else {
+        // Fallback to HTTP API
+        const apiKey = OPENAI_API_KEY;
+        if (!apiKey) {
+            throw new Error('OPENAI_API_KEY not found for vector store file retrieval');
         }
-    };
+        retrieveStatus = () => retrieveVectorStoreFileViaHTTP(vectorStoreId, fileId, apiKey);
+    }
     
     for (;;) {
         const file = await retrieveStatus();
         
         if (file.status === 'completed') {
-            console.log('✅ Vector store file indexing completed:', {
+            logger.info('✅ Vector store file indexing completed:', {
                 fileId: fileId.substring(0, 20) + '...',
                 vectorStoreId: vectorStoreId.substring(0, 20) + '...',
                 elapsed: Date.now() - start
@@ -1277,7 +1308,7 @@ async function waitForVectorIndex(client, vectorStoreId, fileId, { timeoutMs = 1
         // Log progress every 5 seconds
         const elapsed = Date.now() - start;
         if (elapsed % 5000 < pollIntervalMs) {
-            console.log('⏳ Waiting for vector store file indexing...', {
+            logger.info('⏳ Waiting for vector store file indexing...', {
                 fileId: fileId.substring(0, 20) + '...',
                 status: file.status,
                 elapsed: `${Math.round(elapsed / 1000)}s`
@@ -1292,7 +1323,6 @@ async function waitForVectorIndex(client, vectorStoreId, fileId, { timeoutMs = 1
  * Create a batch of files in a vector store via HTTP API (fallback)
  */
 async function createVectorStoreFileBatchViaHTTP(vectorStoreId, fileIds, apiKey) {
-    const https = require('https');
     
     return new Promise((resolve, reject) => {
         const postData = JSON.stringify({
@@ -1301,6 +1331,7 @@ async function createVectorStoreFileBatchViaHTTP(vectorStoreId, fileIds, apiKey)
         
         const options = {
             hostname: 'api.openai.com',
+            agent: openaiHttpsAgent,
             path: `/v1/vector_stores/${vectorStoreId}/file_batches`,
             method: 'POST',
             headers: {
@@ -1312,9 +1343,10 @@ async function createVectorStoreFileBatchViaHTTP(vectorStoreId, fileIds, apiKey)
         };
         
         const req = https.request(options, (res) => {
-            let data = '';
-            res.on('data', (chunk) => { data += chunk; });
+            const chunks = [];
+            res.on('data', (chunk) => { chunks.push(chunk); });
             res.on('end', () => {
+                const data = Buffer.concat(chunks).toString('utf8');
                 if (res.statusCode === 200) {
                     try {
                         resolve(JSON.parse(data));
@@ -1337,11 +1369,11 @@ async function createVectorStoreFileBatchViaHTTP(vectorStoreId, fileIds, apiKey)
  * Retrieve a vector store file batch status via HTTP API (fallback)
  */
 async function retrieveVectorStoreFileBatchViaHTTP(vectorStoreId, batchId, apiKey) {
-    const https = require('https');
     
     return new Promise((resolve, reject) => {
         const options = {
             hostname: 'api.openai.com',
+            agent: openaiHttpsAgent,
             path: `/v1/vector_stores/${vectorStoreId}/file_batches/${batchId}`,
             method: 'GET',
             headers: {
@@ -1351,9 +1383,10 @@ async function retrieveVectorStoreFileBatchViaHTTP(vectorStoreId, batchId, apiKe
         };
         
         const req = https.request(options, (res) => {
-            let data = '';
-            res.on('data', (chunk) => { data += chunk; });
+            const chunks = [];
+            res.on('data', (chunk) => { chunks.push(chunk); });
             res.on('end', () => {
+                const data = Buffer.concat(chunks).toString('utf8');
                 if (res.statusCode === 200) {
                     try {
                         resolve(JSON.parse(data));
@@ -1385,25 +1418,25 @@ async function retrieveVectorStoreFileBatchViaHTTP(vectorStoreId, batchId, apiKe
 async function waitForVectorStoreBatch(client, vectorStoreId, batchId, { timeoutMs = 120000, pollIntervalMs = 1000 } = {}) {
     const start = Date.now();
     
-    // Helper to retrieve batch status
-    const retrieveStatus = async () => {
-        if (client.beta?.vectorStores?.fileBatches?.retrieve) {
-            return await client.beta.vectorStores.fileBatches.retrieve(vectorStoreId, batchId);
-        } else {
-            // Fallback to HTTP API
-            const apiKey = process.env.OPENAI_API_KEY;
-            if (!apiKey) {
-                throw new Error('OPENAI_API_KEY not found for vector store batch retrieval');
-            }
-            return await retrieveVectorStoreFileBatchViaHTTP(vectorStoreId, batchId, apiKey);
+    // Helper to retrieve batch status, resolved once before polling starts
+    let retrieveStatus;
+    if (client.beta?.vectorStores?.fileBatches?.retrieve) {
+        const fileBatchesClient = client.beta.vectorStores.fileBatches;
+        retrieveStatus = () => fileBatchesClient.retrieve(vectorStoreId, batchId);
+    } else {
+        // Fallback to HTTP API
+        const apiKey = OPENAI_API_KEY;
+        if (!apiKey) {
+            throw new Error('OPENAI_API_KEY not found for vector store batch retrieval');
         }
-    };
+        retrieveStatus = () => retrieveVectorStoreFileBatchViaHTTP(vectorStoreId, batchId, apiKey);
+    }
     
     for (;;) {
         const batch = await retrieveStatus();
         
         if (batch.status === 'completed') {
-            console.log('✅ Vector store file batch indexing completed:', {
+            logger.info('✅ Vector store file batch indexing completed:', {
                 batchId: batchId.substring(0, 20) + '...',
                 vectorStoreId: vectorStoreId.substring(0, 20) + '...',
                 fileCount: batch.file_counts?.total || 0,
@@ -1423,7 +1456,7 @@ async function waitForVectorStoreBatch(client, vectorStoreId, batchId, { timeout
         // Log progress every 5 seconds
         const elapsed = Date.now() - start;
         if (elapsed % 5000 < pollIntervalMs) {
-            console.log('⏳ Waiting for vector store file batch indexing...', {
+            logger.info('⏳ Waiting for vector store file batch indexing...', {
                 batchId: batchId.substring(0, 20) + '...',
                 status: batch.status,
                 fileCount: batch.file_counts?.total || 0,
@@ -1439,11 +1472,11 @@ async function waitForVectorStoreBatch(client, vectorStoreId, batchId, { timeout
  * Helper function to retrieve vector store file via HTTP API (fallback)
  */
 async function retrieveVectorStoreFileViaHTTP(vectorStoreId, fileId, apiKey) {
-    const https = require('https');
     
     return new Promise((resolve, reject) => {
         const options = {
             hostname: 'api.openai.com',
+            agent: openaiHttpsAgent,
             path: `/v1/vector_stores/${vectorStoreId}/files/${fileId}`,
             method: 'GET',
             headers: {
@@ -1453,9 +1486,10 @@ async function retrieveVectorStoreFileViaHTTP(vectorStoreId, fileId, apiKey) {
         };
         
         const req = https.request(options, (res) => {
-            let data = '';
-            res.on('data', (chunk) => { data += chunk; });
+            const chunks = [];
+            res.on('data', (chunk) => { chunks.push(chunk); });
             res.on('end', () => {
+                const data = Buffer.concat(chunks).toString('utf8');
                 if (res.statusCode === 200) {
                     try {
                         resolve(JSON.parse(data));
@@ -1483,7 +1517,7 @@ async function getOrCreateVectorStore(client, sessionObj, sessionId, userId) {
             throw new Error('OpenAI client is null or undefined');
         }
 
-        const apiKey = process.env.OPENAI_API_KEY;
+        const apiKey = OPENAI_API_KEY;
         if (!apiKey) {
             throw new Error('OPENAI_API_KEY not found in environment');
         }
@@ -1501,7 +1535,7 @@ async function getOrCreateVectorStore(client, sessionObj, sessionId, userId) {
                 }
                 // Log only if there are files or if this is a new session
                 if (existing.file_counts?.total > 0) {
-                    console.log('✅ Using existing vector store:', {
+                    logger.info('✅ Using existing vector store:', {
                         vectorStoreId: sessionObj.vectorStoreId,
                         fileCount: existing.file_counts?.total
                     });
@@ -1519,7 +1553,7 @@ async function getOrCreateVectorStore(client, sessionObj, sessionId, userId) {
         // Create a new vector store for this session
         // Pattern: Use core OpenAI client for vector stores (not Agents SDK)
         const vectorStoreName = `session:${sessionId || `user_${userId}_${Date.now()}`}`;
-        console.log('🔨 Creating new vector store:', { name: vectorStoreName });
+        logger.info('🔨 Creating new vector store:', { name: vectorStoreName });
         
         let vectorStore;
         if (client.beta?.vectorStores?.create) {
@@ -1529,11 +1563,11 @@ async function getOrCreateVectorStore(client, sessionObj, sessionId, userId) {
             });
         } else {
             // Fallback to HTTP API when SDK doesn't expose beta.vectorStores
-            console.log('📡 Using HTTP API fallback for vector store creation (SDK v6.5.0 limitation)');
+            logger.info('📡 Using HTTP API fallback for vector store creation (SDK v6.5.0 limitation)');
             vectorStore = await createVectorStoreViaHTTP(vectorStoreName, apiKey);
         }
 
-        console.log('✅ Created new vector store:', {
+        logger.info('✅ Created new vector store:', {
             vectorStoreId: vectorStore.id,
             name: vectorStore.name
         });
@@ -1569,7 +1603,7 @@ async function getOrCreateVectorStoreForConversation(client, conversationId, ses
             throw new Error('OpenAI client is null or undefined');
         }
 
-        const apiKey = process.env.OPENAI_API_KEY;
+        const apiKey = OPENAI_API_KEY;
         if (!apiKey) {
             throw new Error('OPENAI_API_KEY not found in environment');
         }
@@ -1599,7 +1633,7 @@ async function getOrCreateVectorStoreForConversation(client, conversationId, ses
                 // Also update session.vectorStoreId for backwards compatibility
                 sessionObj.vectorStoreId = existingVectorStoreId;
                 if (existing.file_counts?.total > 0) {
-                    console.log('✅ Reusing existing vector store for conversation:', {
+                    logger.info('✅ Reusing existing vector store for conversation:', {
                         conversationId: conversationId.substring(0, 20) + '...',
                         vectorStoreId: existingVectorStoreId.substring(0, 20) + '...',
                         fileCount: existing.file_counts?.total
@@ -1617,7 +1651,7 @@ async function getOrCreateVectorStoreForConversation(client, conversationId, ses
 
         // Create a new vector store for this conversation
         const vectorStoreName = `vs:${conversationId.substring(0, 40)}`;
-        console.log('🔨 Creating new vector store for conversation:', { 
+        logger.info('🔨 Creating new vector store for conversation:', { 
             name: vectorStoreName,
             conversationId: conversationId.substring(0, 20) + '...'
         });
@@ -1631,7 +1665,7 @@ async function getOrCreateVectorStoreForConversation(client, conversationId, ses
             vectorStore = await createVectorStoreViaHTTP(vectorStoreName, apiKey);
         }
 
-        console.log('✅ Created new vector store for conversation:', {
+        logger.info('✅ Created new vector store for conversation:', {
             vectorStoreId: vectorStore.id.substring(0, 20) + '...',
             conversationId: conversationId.substring(0, 20) + '...'
         });
@@ -1654,26 +1688,35 @@ async function getOrCreateVectorStoreForConversation(client, conversationId, ses
     }
 }
 
+// ChatKit UI configuration sent with every session we create - identical for all
+// sessions, so built once and shared (the SDK only serializes it)
+const CHATKIT_CONFIGURATION = Object.freeze({
+    file_upload: Object.freeze({
+        enabled: true
+        // Optional: max_bytes: 100 * 1024 * 1024, // 100MB (matches frontend)
+    })
+});
+
 // ChatKit session endpoint - generates client tokens for ChatKit
 // Supports both GET and POST for flexibility
 app.get('/api/chatkit/session', requireAuth, async (req, res) => {
     try {
-        console.log('ChatKit session request received (GET)');
+        logger.info('ChatKit session request received (GET)');
         
         // Set cache headers to prevent any caching (critical for fresh tokens)
         res.set('Cache-Control', 'no-store, must-revalidate');
         res.set('Pragma', 'no-cache');
         res.set('Expires', '0');
         
-        if (!process.env.OPENAI_API_KEY) {
-            console.log('ERROR: OpenAI API Key not configured');
+        if (!OPENAI_API_KEY) {
+            logger.error('ERROR: OpenAI API Key not configured');
             return res.status(500).json({ 
                 error: 'OpenAI API Key not configured' 
             });
         }
 
-        if (!process.env.OPENAI_CHATKIT_PUBLIC_KEY) {
-            console.log('ERROR: OpenAI ChatKit Public Key not configured');
+        if (!OPENAI_CHATKIT_PUBLIC_KEY) {
+            logger.error('ERROR: OpenAI ChatKit Public Key not configured');
             return res.status(500).json({ 
                 error: 'OpenAI ChatKit Public Key not configured' 
             });
@@ -1682,7 +1725,7 @@ app.get('/api/chatkit/session', requireAuth, async (req, res) => {
         // Get active chatbot from database
         const activeChatbot = await getActiveChatbot();
         if (!activeChatbot || !activeChatbot.workflow_id) {
-            console.log('ERROR: No active chatbot found in database');
+            logger.error('ERROR: No active chatbot found in database');
             return res.status(500).json({ 
                 error: 'No active chatbot configured. Please configure a chatbot in the admin panel.' 
             });
@@ -1692,13 +1735,13 @@ app.get('/api/chatkit/session', requireAuth, async (req, res) => {
         const client = getOpenAIClient();
         
         if (!client) {
-            console.log('ERROR: OpenAI client not initialized');
+            logger.error('ERROR: OpenAI client not initialized');
             return res.status(500).json({ 
                 error: 'OpenAI API Key not configured' 
             });
         }
         
-        console.log('Creating ChatKit session...', {
+        logger.info('Creating ChatKit session...', {
             chatbotName: activeChatbot.chatbot_name,
             workflowId: activeChatbot.workflow_id.substring(0, 20) + '...'
         });
@@ -1710,19 +1753,19 @@ app.get('/api/chatkit/session', requireAuth, async (req, res) => {
         // This allows us to link the thread to the vector store during session creation
         let vectorStoreId = null;
         try {
-            console.log('🔍 ChatKit (GET): Creating/getting vector store BEFORE session creation...', {
+            logger.info('🔍 ChatKit (GET): Creating/getting vector store BEFORE session creation...', {
                 userId,
                 hasExistingVectorStore: !!req.session?.vectorStoreId
             });
             // Use a temporary sessionId placeholder for vector store creation
             // The actual sessionId will be created below
             vectorStoreId = await getOrCreateVectorStore(client, req.session, null, userId);
-            console.log('✅ Vector store ready for ChatKit session (GET):', {
+            logger.info('✅ Vector store ready for ChatKit session (GET):', {
                 vectorStoreId,
                 storedInSession: !!req.session.vectorStoreId
             });
         } catch (vectorStoreError) {
-            console.error('❌ Failed to create vector store (GET):', {
+            logger.error('❌ Failed to create vector store (GET):', {
                 error: vectorStoreError?.message,
                 stack: vectorStoreError?.stack,
                 name: vectorStoreError?.name,
@@ -1739,18 +1782,13 @@ app.get('/api/chatkit/session', requireAuth, async (req, res) => {
                 id: activeChatbot.workflow_id,  // <-- from database
                 // optional: state_variables: { user_id: userId }
             },
-            chatkit_configuration: {
-                file_upload: {
-                    enabled: true
-                    // Optional: max_bytes: 100 * 1024 * 1024, // 100MB (matches frontend)
-                }
-            }
+            chatkit_configuration: CHATKIT_CONFIGURATION
             // NOTE: do NOT include `model` here - it's defined by the workflow
         };
         
         // ---- harden the payload & prove what's being sent ----
         if (sessionConfig.thread) {
-            console.warn("⚠️ Removing unexpected sessionConfig.thread before create()");
+            logger.warn("⚠️ Removing unexpected sessionConfig.thread before create()");
             delete sessionConfig.thread;
         }
         
@@ -1775,13 +1813,15 @@ app.get('/api/chatkit/session', requireAuth, async (req, res) => {
         // Do not send tools/tool_resources to ChatKit Sessions API (unsupported)
         // Vector store binding will be handled at message/response time.
 
-        // Log exactly what we send (keys + pretty JSON)
-        console.log("session.create payload keys (attempt 1):", Object.keys(sessionConfig));
-        console.log("session.create payload (attempt 1):", JSON.stringify(sessionConfig, null, 2));
+        // Log what we send: the keys, plus the pretty-printed payload at LOG_LEVEL=debug
+        logger.info("session.create payload keys (attempt 1):", Object.keys(sessionConfig));
+        if (logger.isLevelEnabled('debug')) {
+            logger.debug("session.create payload (attempt 1):", JSON.stringify(sessionConfig, null, 2));
+        }
 
         const session = await client.beta.chatkit.sessions.create(sessionConfig);
         
-        console.log('Session created successfully:', {
+        logger.info('Session created successfully:', {
             hasClientToken: Boolean(session.clientToken),
             hasClientSecret: Boolean(session.client_secret),
             hasSessionId: Boolean(session.id),
@@ -1804,11 +1844,11 @@ app.get('/api/chatkit/session', requireAuth, async (req, res) => {
                 req.session.vectorStoreId = boundVectorStoreId;
             }
         } catch (e) {
-            console.warn('Unable to persist chatkitSessionId in session (GET):', e?.message);
+            logger.warn('Unable to persist chatkitSessionId in session (GET):', e?.message);
         }
         
         if (!clientToken) {
-            console.error('ERROR: Neither clientToken nor client_secret found!');
+            logger.error('ERROR: Neither clientToken nor client_secret found!');
             return res.status(500).json({ 
                 error: 'Session created but no client token found',
                 sessionKeys: Object.keys(session)
@@ -1816,7 +1856,7 @@ app.get('/api/chatkit/session', requireAuth, async (req, res) => {
         }
         
         if (!sessionId) {
-            console.error('ERROR: Session ID not found in session response!');
+            logger.error('ERROR: Session ID not found in session response!');
             return res.status(500).json({ 
                 error: 'Session created but no session ID found',
                 sessionKeys: Object.keys(session)
@@ -1844,17 +1884,17 @@ app.get('/api/chatkit/session', requireAuth, async (req, res) => {
             const serverNowIso = new Date().toISOString();
             const expiresIso = typeof expiresAtSeconds === 'number' ? new Date(expiresAtSeconds * 1000).toISOString() : 'unknown';
             const msUntilExpiry = typeof expiresAtSeconds === 'number' ? (expiresAtSeconds * 1000 - Date.now()) : 'unknown';
-            console.log('ChatKit token timing (GET):', { serverNow: serverNowIso, expiresAt: expiresIso, msUntilExpiry });
+            logger.info('ChatKit token timing (GET):', { serverNow: serverNowIso, expiresAt: expiresIso, msUntilExpiry });
         } catch (e) {
-            console.log('ChatKit token timing log failed (GET):', e.message);
+            logger.info('ChatKit token timing log failed (GET):', e.message);
         }
 
         // Choose public key based on request host (use a local key for localhost)
         const hostHeader = req.headers.host || '';
         const isLocalHost = /(^localhost)|(127\.0\.0\.1)/i.test(hostHeader);
-        const publicKey = isLocalHost && process.env.OPENAI_CHATKIT_PUBLIC_KEY_LOCAL
-            ? process.env.OPENAI_CHATKIT_PUBLIC_KEY_LOCAL
-            : process.env.OPENAI_CHATKIT_PUBLIC_KEY;
+        const publicKey = isLocalHost && OPENAI_CHATKIT_PUBLIC_KEY_LOCAL
+            ? OPENAI_CHATKIT_PUBLIC_KEY_LOCAL
+            : OPENAI_CHATKIT_PUBLIC_KEY;
 
         // Return the session information that ChatKit needs, including vector_store_id
         const sessionData = {
@@ -1864,7 +1904,7 @@ app.get('/api/chatkit/session', requireAuth, async (req, res) => {
             vector_store_id: vectorStoreId || null  // ✅ NEW: Include vector_store_id
         };
         
-        console.log('Sending ChatKit session data (GET):', {
+        logger.info('Sending ChatKit session data (GET):', {
             clientToken: clientToken.substring(0, 20) + '...',
             publicKey: sessionData.publicKey.substring(0, 20) + '...',
             sessionId: sessionId,
@@ -1874,8 +1914,8 @@ app.get('/api/chatkit/session', requireAuth, async (req, res) => {
         res.json(sessionData);
 
     } catch (error) {
-        console.error('ChatKit session error:', error);
-        console.error("session.create failed:", error?.response?.data ?? error?.message ?? error);
+        logger.error('ChatKit session error:', error);
+        logger.error("session.create failed:", error?.response?.data ?? error?.message ?? error);
         res.status(500).json({ 
             error: 'Internal server error',
             details: error.message 
@@ -1886,22 +1926,22 @@ app.get('/api/chatkit/session', requireAuth, async (req, res) => {
 // POST endpoint for backwards compatibility (also returns no-store)
 app.post('/api/chatkit/session', requireAuth, async (req, res) => {
     try {
-        console.log('ChatKit session request received (POST)');
+        logger.info('ChatKit session request received (POST)');
         
         // Set cache headers to prevent any caching (critical for fresh tokens)
         res.set('Cache-Control', 'no-store, must-revalidate');
         res.set('Pragma', 'no-cache');
         res.set('Expires', '0');
         
-        if (!process.env.OPENAI_API_KEY) {
-            console.log('ERROR: OpenAI API Key not configured');
+        if (!OPENAI_API_KEY) {
+            logger.error('ERROR: OpenAI API Key not configured');
             return res.status(500).json({ 
                 error: 'OpenAI API Key not configured' 
             });
         }
 
-        if (!process.env.OPENAI_CHATKIT_PUBLIC_KEY) {
-            console.log('ERROR: OpenAI ChatKit Public Key not configured');
+        if (!OPENAI_CHATKIT_PUBLIC_KEY) {
+            logger.error('ERROR: OpenAI ChatKit Public Key not configured');
             return res.status(500).json({ 
                 error: 'OpenAI ChatKit Public Key not configured' 
             });
@@ -1910,7 +1950,7 @@ app.post('/api/chatkit/session', requireAuth, async (req, res) => {
         // Get active chatbot from database
         const activeChatbot = await getActiveChatbot();
         if (!activeChatbot || !activeChatbot.workflow_id) {
-            console.log('ERROR: No active chatbot found in database');
+            logger.error('ERROR: No active chatbot found in database');
             return res.status(500).json({ 
                 error: 'No active chatbot configured. Please configure a chatbot in the admin panel.' 
             });
@@ -1920,13 +1960,13 @@ app.post('/api/chatkit/session', requireAuth, async (req, res) => {
         const client = getOpenAIClient();
         
         if (!client) {
-            console.log('ERROR: OpenAI client not initialized');
+            logger.error('ERROR: OpenAI client not initialized');
             return res.status(500).json({ 
                 error: 'OpenAI API Key not configured' 
             });
         }
         
-        console.log('Creating ChatKit session...', {
+        logger.info('Creating ChatKit session...', {
             chatbotName: activeChatbot.chatbot_name,
             workflowId: activeChatbot.workflow_id.substring(0, 20) + '...'
         });
@@ -1938,19 +1978,19 @@ app.post('/api/chatkit/session', requireAuth, async (req, res) => {
         // This allows us to link the thread to the vector store during session creation
         let vectorStoreId = null;
         try {
-            console.log('🔍 ChatKit (POST): Creating/getting vector store BEFORE session creation...', {
+            logger.info('🔍 ChatKit (POST): Creating/getting vector store BEFORE session creation...', {
                 userId,
                 hasExistingVectorStore: !!req.session?.vectorStoreId
             });
             // Use a temporary sessionId placeholder for vector store creation
             // The actual sessionId will be created below
             vectorStoreId = await getOrCreateVectorStore(client, req.session, null, userId);
-            console.log('✅ Vector store ready for ChatKit session (POST):', {
+            logger.info('✅ Vector store ready for ChatKit session (POST):', {
                 vectorStoreId,
                 storedInSession: !!req.session.vectorStoreId
             });
         } catch (vectorStoreError) {
-            console.error('❌ Failed to create vector store (POST):', {
+            logger.error('❌ Failed to create vector store (POST):', {
                 error: vectorStoreError?.message,
                 stack: vectorStoreError?.stack,
                 name: vectorStoreError?.name,
@@ -1967,12 +2007,7 @@ app.post('/api/chatkit/session', requireAuth, async (req, res) => {
                 id: activeChatbot.workflow_id,  // <-- from database
                 // optional: state_variables: { user_id: userId }
             },
-            chatkit_configuration: {
-                file_upload: {
-                    enabled: true
-                    // Optional: max_bytes: 100 * 1024 * 1024, // 100MB (matches frontend)
-                }
-            }
+            chatkit_configuration: CHATKIT_CONFIGURATION
             // NOTE: do NOT include `model` here - it's defined by the workflow
         };
         
@@ -1994,7 +2029,7 @@ app.post('/api/chatkit/session', requireAuth, async (req, res) => {
 
         const session = await client.beta.chatkit.sessions.create(sessionConfig);
         
-        console.log('Session created successfully:', {
+        logger.info('Session created successfully:', {
             hasClientToken: Boolean(session.clientToken),
             hasClientSecret: Boolean(session.client_secret),
             hasSessionId: Boolean(session.id),
@@ -2017,11 +2052,11 @@ app.post('/api/chatkit/session', requireAuth, async (req, res) => {
                 req.session.vectorStoreId = boundVectorStoreId;
             }
         } catch (e) {
-            console.warn('Unable to persist chatkitSessionId in session (POST):', e?.message);
+            logger.warn('Unable to persist chatkitSessionId in session (POST):', e?.message);
         }
         
         if (!clientToken) {
-            console.error('ERROR: Neither clientToken nor client_secret found!');
+            logger.error('ERROR: Neither clientToken nor client_secret found!');
             return res.status(500).json({ 
                 error: 'Session created but no client token found',
                 sessionKeys: Object.keys(session)
@@ -2029,7 +2064,7 @@ app.post('/api/chatkit/session', requireAuth, async (req, res) => {
         }
         
         if (!sessionId) {
-            console.error('ERROR: Session ID not found in session response!');
+            logger.error('ERROR: Session ID not found in session response!');
             return res.status(500).json({ 
                 error: 'Session created but no session ID found',
                 sessionKeys: Object.keys(session)
@@ -2057,17 +2092,17 @@ app.post('/api/chatkit/session', requireAuth, async (req, res) => {
             const serverNowIso = new Date().toISOString();
             const expiresIso = typeof expiresAtSeconds === 'number' ? new Date(expiresAtSeconds * 1000).toISOString() : 'unknown';
             const msUntilExpiry = typeof expiresAtSeconds === 'number' ? (expiresAtSeconds * 1000 - Date.now()) : 'unknown';
-            console.log('ChatKit token timing (POST):', { serverNow: serverNowIso, expiresAt: expiresIso, msUntilExpiry });
+            logger.info('ChatKit token timing (POST):', { serverNow: serverNowIso, expiresAt: expiresIso, msUntilExpiry });
         } catch (e) {
-            console.log('ChatKit token timing log failed (POST):', e.message);
+            logger.info('ChatKit token timing log failed (POST):', e.message);
         }
 
         // Choose public key based on request host (use a local key for localhost)
         const hostHeader = req.headers.host || '';
         const isLocalHost = /(^localhost)|(127\.0\.0\.1)/i.test(hostHeader);
-        const publicKey = isLocalHost && process.env.OPENAI_CHATKIT_PUBLIC_KEY_LOCAL
-            ? process.env.OPENAI_CHATKIT_PUBLIC_KEY_LOCAL
-            : process.env.OPENAI_CHATKIT_PUBLIC_KEY;
+        const publicKey = isLocalHost && OPENAI_CHATKIT_PUBLIC_KEY_LOCAL
+            ? OPENAI_CHATKIT_PUBLIC_KEY_LOCAL
+            : OPENAI_CHATKIT_PUBLIC_KEY;
 
         // Return the session information that ChatKit needs, including vector_store_id
         const sessionData = {
@@ -2077,7 +2112,7 @@ app.post('/api/chatkit/session', requireAuth, async (req, res) => {
             vector_store_id: vectorStoreId || null  // ✅ NEW: Include vector_store_id
         };
         
-        console.log('Sending ChatKit session data (POST):', {
+        logger.info('Sending ChatKit session data (POST):', {
             clientToken: clientToken.substring(0, 20) + '...',
             publicKey: sessionData.publicKey.substring(0, 20) + '...',
             sessionId: sessionId,
@@ -2087,8 +2122,8 @@ app.post('/api/chatkit/session', requireAuth, async (req, res) => {
         res.json(sessionData);
 
     } catch (error) {
-        console.error('ChatKit session error:', error);
-        console.error("session.create failed:", error?.response?.data ?? error?.message ?? error);
+        logger.error('ChatKit session error:', error);
+        logger.error("session.create failed:", error?.response?.data ?? error?.message ?? error);
         res.status(500).json({ 
             error: 'Internal server error',
             details: error.message 
@@ -2099,7 +2134,7 @@ app.post('/api/chatkit/session', requireAuth, async (req, res) => {
 // ChatKit session reset endpoint - ends current session and starts a new one
 app.post('/api/chatkit/session/reset', requireAuth, async (req, res) => {
     try {
-        console.log('ChatKit session reset request received');
+        logger.info('ChatKit session reset request received');
         
         // Store old session ID for logging
         const oldSessionId = req.session.chatkitSessionId;
@@ -2113,14 +2148,14 @@ app.post('/api/chatkit/session/reset', requireAuth, async (req, res) => {
                     // Note: OpenAI ChatKit may not have a delete method, so we'll catch and continue
                     try {
                         await client.beta.chatkit.sessions.delete(oldSessionId);
-                        console.log('✅ Old ChatKit session deleted:', oldSessionId);
+                        logger.info('✅ Old ChatKit session deleted:', oldSessionId);
                     } catch (deleteError) {
                         // If delete is not supported or fails, just log and continue
-                        console.log('⚠️ Could not delete old ChatKit session (may not be supported):', deleteError?.message || 'Unknown error');
+                        logger.info('⚠️ Could not delete old ChatKit session (may not be supported):', deleteError?.message || 'Unknown error');
                     }
                 }
             } catch (error) {
-                console.warn('⚠️ Error attempting to delete old ChatKit session:', error?.message);
+                logger.warn('⚠️ Error attempting to delete old ChatKit session:', error?.message);
                 // Continue anyway - the old session will expire naturally
             }
         }
@@ -2134,13 +2169,13 @@ app.post('/api/chatkit/session/reset', requireAuth, async (req, res) => {
         res.set('Expires', '0');
         
         // Validate environment variables
-        if (!process.env.OPENAI_API_KEY) {
+        if (!OPENAI_API_KEY) {
             return res.status(500).json({ 
                 error: 'OpenAI API Key not configured' 
             });
         }
 
-        if (!process.env.OPENAI_CHATKIT_PUBLIC_KEY) {
+        if (!OPENAI_CHATKIT_PUBLIC_KEY) {
             return res.status(500).json({ 
                 error: 'OpenAI ChatKit Public Key not configured' 
             });
@@ -2163,7 +2198,7 @@ app.post('/api/chatkit/session/reset', requireAuth, async (req, res) => {
             });
         }
         
-        console.log('Creating new ChatKit session after reset...', {
+        logger.info('Creating new ChatKit session after reset...', {
             chatbotName: activeChatbot.chatbot_name,
             workflowId: activeChatbot.workflow_id.substring(0, 20) + '...'
         });
@@ -2174,17 +2209,17 @@ app.post('/api/chatkit/session/reset', requireAuth, async (req, res) => {
         // STEP 1: Create or get vector store FIRST (before creating session)
         let vectorStoreId = null;
         try {
-            console.log('🔍 ChatKit (RESET): Creating/getting vector store BEFORE session creation...', {
+            logger.info('🔍 ChatKit (RESET): Creating/getting vector store BEFORE session creation...', {
                 userId,
                 hasExistingVectorStore: !!req.session?.vectorStoreId
             });
             vectorStoreId = await getOrCreateVectorStore(client, req.session, null, userId);
-            console.log('✅ Vector store ready for ChatKit session (RESET):', {
+            logger.info('✅ Vector store ready for ChatKit session (RESET):', {
                 vectorStoreId,
                 storedInSession: !!req.session.vectorStoreId
             });
         } catch (vectorStoreError) {
-            console.error('❌ Failed to create vector store (RESET):', {
+            logger.error('❌ Failed to create vector store (RESET):', {
                 error: vectorStoreError?.message,
                 stack: vectorStoreError?.stack,
                 name: vectorStoreError?.name,
@@ -2200,16 +2235,11 @@ app.post('/api/chatkit/session/reset', requireAuth, async (req, res) => {
             workflow: {
                 id: activeChatbot.workflow_id,  // <-- from database
             },
-            chatkit_configuration: {
-                file_upload: {
-                    enabled: true
-                    // Optional: max_bytes: 100 * 1024 * 1024, // 100MB (matches frontend)
-                }
-            }
+            chatkit_configuration: CHATKIT_CONFIGURATION
         };
         
         if (sessionConfig.thread) {
-            console.warn("⚠️ Removing unexpected sessionConfig.thread before create()");
+            logger.warn("⚠️ Removing unexpected sessionConfig.thread before create()");
             delete sessionConfig.thread;
         }
         
@@ -2238,7 +2268,7 @@ app.post('/api/chatkit/session/reset', requireAuth, async (req, res) => {
                 req.session.vectorStoreId = boundVectorStoreId;
             }
         } catch (e) {
-            console.warn('Unable to persist chatkitSessionId in session (RESET):', e?.message);
+            logger.warn('Unable to persist chatkitSessionId in session (RESET):', e?.message);
         }
         
         if (!clientToken) {
@@ -2258,9 +2288,9 @@ app.post('/api/chatkit/session/reset', requireAuth, async (req, res) => {
         // Choose public key based on request host
         const hostHeader = req.headers.host || '';
         const isLocalHost = /(^localhost)|(127\.0\.0\.1)/i.test(hostHeader);
-        const publicKey = isLocalHost && process.env.OPENAI_CHATKIT_PUBLIC_KEY_LOCAL
-            ? process.env.OPENAI_CHATKIT_PUBLIC_KEY_LOCAL
-            : process.env.OPENAI_CHATKIT_PUBLIC_KEY;
+        const publicKey = isLocalHost && OPENAI_CHATKIT_PUBLIC_KEY_LOCAL
+            ? OPENAI_CHATKIT_PUBLIC_KEY_LOCAL
+            : OPENAI_CHATKIT_PUBLIC_KEY;
 
         // Return the session information that ChatKit needs
         const sessionData = {
@@ -2271,7 +2301,7 @@ app.post('/api/chatkit/session/reset', requireAuth, async (req, res) => {
         };
         
         // Log the reset to deployment logs
-        console.log('🔄 ChatKit: Session reset - new session created', {
+        logger.info('🔄 ChatKit: Session reset - new session created', {
             oldSessionId: oldSessionId || 'none',
             newSessionId: sessionId,
             userId: req.session.user?.id || 'unknown',
@@ -2280,7 +2310,7 @@ app.post('/api/chatkit/session/reset', requireAuth, async (req, res) => {
             timestamp: new Date().toISOString()
         });
         
-        console.log('Sending ChatKit session data (RESET):', {
+        logger.info('Sending ChatKit session data (RESET):', {
             clientToken: clientToken.substring(0, 20) + '...',
             publicKey: sessionData.publicKey.substring(0, 20) + '...',
             sessionId: sessionId,
@@ -2293,8 +2323,8 @@ app.post('/api/chatkit/session/reset', requireAuth, async (req, res) => {
         });
 
     } catch (error) {
-        console.error('ChatKit session reset error:', error);
-        console.error("session.create failed:", error?.response?.data ?? error?.message ?? error);
+        logger.error('ChatKit session reset error:', error);
+        logger.error("session.create failed:", error?.response?.data ?? error?.message ?? error);
         res.status(500).json({ 
             error: 'Internal server error',
             details: error.message 
@@ -2346,8 +2376,8 @@ app.get('/api/vector-store/id', requireAuth, async (req, res) => {
 // Presign S3 upload for ChatKit attachments (following guidance pattern)
 app.post('/api/uploads/presign', requireAuth, async (req, res) => {
     try {
-        const bucketName = process.env.S3_BUCKET_NAME;
-        const region = process.env.AWS_REGION || 'us-east-1';
+        const bucketName = S3_BUCKET_NAME;
+        const region = AWS_REGION;
 
         if (!bucketName) {
             console.error('S3 presign failed: S3_BUCKET_NAME not configured');
@@ -2407,7 +2437,7 @@ app.post('/api/uploads/presign', requireAuth, async (req, res) => {
             ServerSideEncryption: 'AES256'  // SSE-S3 encryption
         });
 
-        console.log('Generated S3 presign for ChatKit upload:', {
+        logger.info('Generated S3 presign for ChatKit upload:', {
             userId,
             objectKey,
             contentType: safeContentType,
@@ -2431,8 +2461,8 @@ app.post('/api/uploads/presign', requireAuth, async (req, res) => {
 // No messages created, no responses created - just ingest and return file_id
 app.post('/api/files/ingest-s3', requireAuth, async (req, res) => {
     try {
-        const bucketName = process.env.S3_BUCKET_NAME || process.env.S3_BUCKET;
-        const region = process.env.AWS_REGION || 'us-east-1';
+        const bucketName = S3_INGEST_BUCKET;
+        const region = AWS_REGION;
         const { key, bucket, filename } = req.body || {};
 
         const effectiveBucket = bucket || bucketName;
@@ -2444,7 +2474,7 @@ app.post('/api/files/ingest-s3', requireAuth, async (req, res) => {
             return res.status(400).json({ error: 'Missing S3 key' });
         }
 
-        if (!process.env.OPENAI_API_KEY) {
+        if (!OPENAI_API_KEY) {
             console.error('ingest-s3 failed: OpenAI API key missing');
             return res.status(500).json({ error: 'OpenAI API Key not configured' });
         }
@@ -2492,9 +2522,9 @@ app.post('/api/files/ingest-s3', requireAuth, async (req, res) => {
         const uploaded = await client.files.create({
             file: fileForUpload,
             purpose: 'assistants',
-        });
+        }, { timeout: OPENAI_UPLOAD_TIMEOUT_MS });
 
-        console.log('Quiet ingest successful:', {
+        logger.info('Quiet ingest successful:', {
             file_id: uploaded.id,
             filename: resolvedFilename,
             content_type: resolvedContentType
@@ -2519,7 +2549,7 @@ app.post('/api/files/ingest-s3', requireAuth, async (req, res) => {
             // 1) Prefer the session-bound vector store (this is what ChatKit binds to at session creation)
             if (req.session?.vectorStoreId) {
                 vectorStoreId = req.session.vectorStoreId;
-                console.log('✅ ingest-s3: Using existing session vector store:', {
+                logger.info('✅ ingest-s3: Using existing session vector store:', {
                     vectorStoreId: vectorStoreId.substring(0, 20) + '...',
                     file_id: uploaded.id
                 });
@@ -2531,7 +2561,7 @@ app.post('/api/files/ingest-s3', requireAuth, async (req, res) => {
                 const sessionId = `session_${userId}_${req.sessionID}`;
                 try {
                     vectorStoreId = await getOrCreateVectorStore(client, req.session, sessionId, userId);
-                    console.log('✅ ingest-s3: Using session-based vector store (created):', {
+                    logger.info('✅ ingest-s3: Using session-based vector store (created):', {
                         vectorStoreId: vectorStoreId.substring(0, 20) + '...',
                         file_id: uploaded.id
                     });
@@ -2545,14 +2575,14 @@ app.post('/api/files/ingest-s3', requireAuth, async (req, res) => {
                 }
             }
             
-            console.log('🔍 ingest-s3: Checking for vector store:', {
+            logger.info('🔍 ingest-s3: Checking for vector store:', {
                 hasVectorStoreId: !!vectorStoreId,
                 vectorStoreId: vectorStoreId || 'NONE',
                 file_id: uploaded.id
             });
             
             if (vectorStoreId) {
-                console.log('📤 ingest-s3: Adding file to vector store and waiting for indexing...', {
+                logger.info('📤 ingest-s3: Adding file to vector store and waiting for indexing...', {
                     file_id: uploaded.id,
                     vectorStoreId
                 });
@@ -2563,11 +2593,11 @@ app.post('/api/files/ingest-s3', requireAuth, async (req, res) => {
                     });
                 } else {
                     // Fallback to HTTP API
-                    const apiKey = process.env.OPENAI_API_KEY;
+                    const apiKey = OPENAI_API_KEY;
                     vsFile = await addFileToVectorStoreViaHTTP(vectorStoreId, uploaded.id, apiKey);
                 }
                 
-                console.log('📎 File added to vector store, waiting for indexing (ingest-s3)...', {
+                logger.info('📎 File added to vector store, waiting for indexing (ingest-s3)...', {
                     file_id: uploaded.id,
                     vectorStoreId,
                     initialStatus: vsFile.status
@@ -2581,7 +2611,7 @@ app.post('/api/files/ingest-s3', requireAuth, async (req, res) => {
                         pollIntervalMs: 2000 // Poll every 2 seconds
                     });
                     
-                    console.log('✅ File indexed and ready for search (ingest-s3):', {
+                    logger.info('✅ File indexed and ready for search (ingest-s3):', {
                         file_id: uploaded.id,
                         vectorStoreId,
                         status: indexedFile.status,
@@ -2625,7 +2655,7 @@ app.post('/api/files/ingest-s3', requireAuth, async (req, res) => {
                 content_type: resolvedContentType,
             });
 
-            console.log('File category detection for ingest-s3:', {
+            logger.info('File category detection for ingest-s3:', {
                 file_id: uploaded.id,
                 filename: resolvedFilename,
                 content_type: resolvedContentType,
@@ -2657,8 +2687,8 @@ app.post('/api/files/ingest-s3', requireAuth, async (req, res) => {
 // Import from S3 to OpenAI Files API (following guidance pattern)
 app.post('/api/openai/import-s3', requireAuth, async (req, res) => {
     try {
-        const bucketName = process.env.S3_BUCKET_NAME;
-        const region = process.env.AWS_REGION || 'us-east-1';
+        const bucketName = S3_BUCKET_NAME;
+        const region = AWS_REGION;
         const { objectKey, filename, purpose = 'assistants' } = req.body || {};
 
         if (!bucketName) {
@@ -2670,7 +2700,7 @@ app.post('/api/openai/import-s3', requireAuth, async (req, res) => {
             return res.status(400).json({ error: 'objectKey is required' });
         }
 
-        if (!process.env.OPENAI_API_KEY) {
+        if (!OPENAI_API_KEY) {
             console.error('S3 import failed: OpenAI API key missing');
             return res.status(500).json({ error: 'OpenAI API Key not configured' });
         }
@@ -2707,7 +2737,7 @@ app.post('/api/openai/import-s3', requireAuth, async (req, res) => {
         const resolvedFilename = filename || path.basename(objectKey);
         const resolvedContentType = objectData.ContentType || 'application/octet-stream';
 
-        console.log('Importing S3 file to OpenAI Files API:', {
+        logger.info('Importing S3 file to OpenAI Files API:', {
             objectKey,
             resolvedFilename,
             resolvedContentType,
@@ -2730,9 +2760,9 @@ app.post('/api/openai/import-s3', requireAuth, async (req, res) => {
         const uploadedFile = await client.files.create({
             file: fileForUpload,
             purpose: purpose
-        });
+        }, { timeout: OPENAI_UPLOAD_TIMEOUT_MS });
 
-        console.log('Successfully imported file to OpenAI:', {
+        logger.info('Successfully imported file to OpenAI:', {
             file_id: uploadedFile.id,
             filename: uploadedFile.filename,
             bytes: uploadedFile.bytes
@@ -2743,7 +2773,7 @@ app.post('/api/openai/import-s3', requireAuth, async (req, res) => {
         try {
             const vectorStoreId = req.session?.vectorStoreId;
             if (vectorStoreId) {
-                console.log('📤 Adding file to vector store and waiting for indexing...', {
+                logger.info('📤 Adding file to vector store and waiting for indexing...', {
                     file_id: uploadedFile.id,
                     vectorStoreId
                 });
@@ -2755,11 +2785,11 @@ app.post('/api/openai/import-s3', requireAuth, async (req, res) => {
                     });
                 } else {
                     // Fallback to HTTP API
-                    const apiKey = process.env.OPENAI_API_KEY;
+                    const apiKey = OPENAI_API_KEY;
                     vsFile = await addFileToVectorStoreViaHTTP(vectorStoreId, uploadedFile.id, apiKey);
                 }
                 
-                console.log('📎 File added to vector store, waiting for indexing...', {
+                logger.info('📎 File added to vector store, waiting for indexing...', {
                     file_id: uploadedFile.id,
                     vectorStoreId,
                     initialStatus: vsFile.status
@@ -2773,7 +2803,7 @@ app.post('/api/openai/import-s3', requireAuth, async (req, res) => {
                         pollIntervalMs: 2000 // Poll every 2 seconds
                     });
                     
-                    console.log('✅ File indexed and ready for search:', {
+                    logger.info('✅ File indexed and ready for search:', {
                         file_id: uploadedFile.id,
                         vectorStoreId,
                         status: indexedFile.status,
@@ -2810,7 +2840,7 @@ app.post('/api/openai/import-s3', requireAuth, async (req, res) => {
             if (!req.session.chatkitFileIds.includes(uploadedFile.id)) {
                 req.session.chatkitFileIds.push(uploadedFile.id);
             }
-            console.log('Stashed file_id for quiet ingest:', {
+            logger.info('Stashed file_id for quiet ingest:', {
                 file_id: uploadedFile.id,
                 totalStashed: req.session.chatkitFileIds.length
             });
@@ -2843,6 +2873,13 @@ app.post('/api/openai/import-s3', requireAuth, async (req, res) => {
 // Send message to ChatKit thread using Responses API
 app.post('/api/chatkit/message', requireAuth, chatkitMessage);
 
+// Same as above, streamed back as Server-Sent Events
+app.post('/api/chatkit/message/stream', requireAuth, chatkitMessageStream);
+
+// Queue non-realtime messages through the OpenAI Batch API and poll for results
+app.post('/api/chatkit/batch', requireAuth, batchJsonParser, chatkitBatchCreate);
+app.get('/api/chatkit/batch/:batchId', requireAuth, chatkitBatchStatus);
+
 
 // ============ Access Log API Endpoints ============
 // Get access logs for a specific user (admin only)
@@ -2997,7 +3034,6 @@ app.post('/api/admin/users/update', requireAuth, checkUserPermissions, requireAd
             }
             
             // Validate user type
-            const { isValidUserType } = require('./constants.js');
             if (!isValidUserType(userType)) {
                 throw new Error(`Invalid user type: ${userType}`);
             }
@@ -3055,8 +3091,8 @@ app.post('/api/admin/users/update', requireAuth, checkUserPermissions, requireAd
 // List S3 objects (admin only)
 app.get('/api/admin/s3/objects', requireAuth, checkUserPermissions, requireAdmin, async (req, res) => {
     try {
-        const bucketName = process.env.S3_BUCKET_NAME;
-        const region = process.env.AWS_REGION || 'us-east-1';
+        const bucketName = S3_BUCKET_NAME;
+        const region = AWS_REGION;
 
         if (!bucketName) {
             return res.status(500).json({ success: false, error: 'S3_BUCKET_NAME is not configured' });
@@ -3231,9 +3267,6 @@ app.post('/api/admin/chatbots/update', requireAuth, checkUserPermissions, requir
             });
         }
 
-        // Validate chatbot status using constants
-        const { isValidChatbotStatus } = require('./constants.js');
-
         const updatePromises = chatbots.map(async (chatbotUpdate) => {
             const { chatbot_id, chatbot_name, workflow_id, workflow_version, status } = chatbotUpdate;
             
@@ -3414,12 +3447,31 @@ app.post('/api/admin/version/increment', requireAuth, checkUserPermissions, requ
 });
 
 // Health check endpoint for Railway
+// Probed every few seconds, so the serialized body and its ETag are rebuilt at
+// most once per HEALTH_MAX_AGE_SECONDS and clients/proxies may cache it that long
+const HEALTH_MAX_AGE_SECONDS = 5;
+let healthCache = { body: null, etag: null, expiresAt: 0 };
+
 app.get('/health', (req, res) => {
-    res.status(200).json({ 
-        status: 'OK', 
-        message: 'Chat interface is running',
-        timestamp: new Date().toISOString()
+    const now = Date.now();
+    if (now >= healthCache.expiresAt) {
+        const body = JSON.stringify({
+            status: 'OK',
+            message: 'Chat interface is running',
+            timestamp: new Date(now).toISOString()
+        });
+        healthCache = {
+            body,
+            etag: `"${crypto.createHash('sha1').update(body).digest('base64')}"`,
+            expiresAt: now + HEALTH_MAX_AGE_SECONDS * 1000
+        };
+    }
+
+    res.set({
+        'Cache-Control': `public, max-age=${HEALTH_MAX_AGE_SECONDS}`,
+        'ETag': healthCache.etag
     });
+    res.status(200).type('json').send(healthCache.body);
 });
 
 // Logger status endpoint (for debugging)
@@ -3681,10 +3733,68 @@ app.get("*", (req, res) => {
 	res.sendFile(path.join(__dirname, "dist", "index.html"));
 });
 
+// Open a connection to OpenAI (DNS, TCP, TLS) right after boot so the first
+// chat request doesn't pay for it. Non-blocking - failures are only logged.
+const warmUpOpenAI = async () => {
+    const client = getOpenAIClient();
+    if (!client) {
+        return;
+    }
+    try {
+        await client.models.list();
+        console.log('🔥 OpenAI connection warmed up');
+    } catch (error) {
+        console.warn('⚠️  OpenAI warm-up failed (non-critical):', error.message);
+    }
+};
+
+// HTTP server tuning
+//   SERVER_KEEP_ALIVE_MS    idle keep-alive before closing a client socket (default 75s,
+//                           longer than the proxy's idle timeout so it never reuses a closed socket)
+//   SERVER_MAX_CONNECTIONS  concurrent sockets per process before new ones are refused (default 1000)
+//   SERVER_BACKLOG          pending-connection queue length for bursts (default 2048, capped by the OS)
+const SERVER_KEEP_ALIVE_MS = Number(process.env.SERVER_KEEP_ALIVE_MS || 75 * 1000);
+const SERVER_MAX_CONNECTIONS = Number(process.env.SERVER_MAX_CONNECTIONS || 1000);
+const SERVER_BACKLOG = Number(process.env.SERVER_BACKLOG || 2048);
+
 // Start the server
-app.listen(PORT, '0.0.0.0', async () => {
+const server = app.listen(PORT, '0.0.0.0', SERVER_BACKLOG, async () => {
     console.log(`🚀 Chat interface server running on port ${PORT}`);
     console.log(`📱 Access your chat at: http://localhost:${PORT}`);
     console.log(`🔐 AWS Cognito authentication enabled for kyocare.com domain`);
+    warmUpOpenAI();
 });
+server.keepAliveTimeout = SERVER_KEEP_ALIVE_MS;
+server.headersTimeout = SERVER_KEEP_ALIVE_MS + 1000;
+server.maxConnections = SERVER_MAX_CONNECTIONS;
+
+// Graceful shutdown - Railway sends SIGTERM on redeploy. Stop accepting
+// connections, let in-flight requests finish, then close the database pool.
+// Signals can arrive twice (e.g. Ctrl-C reaches both the cluster primary and
+// this worker, and the primary forwards it too), so only the first one counts.
+let shuttingDown = false;
+const shutdown = (signal) => {
+    if (shuttingDown) {
+        return;
+    }
+    shuttingDown = true;
+    console.log(`🛑 ${signal} received, shutting down...`);
+    setTimeout(() => process.exit(1), 10000).unref();
+    server.close(async () => {
+        try {
+            if (loggingConfig.logger && loggingConfig.logger.pool) {
+                await loggingConfig.logger.pool.end();
+            }
+        } catch (error) {
+            console.error('Error closing database pool:', error.message);
+        }
+        process.exit(0);
+    });
+    // Node 18's close() waits for idle keep-alive sockets, which with the long
+    // keepAliveTimeout would outlast the 10s deadline above; close them now.
+    // In-flight requests are unaffected and still finish.
+    server.closeIdleConnections?.();
+};
+process.on('SIGTERM', () => shutdown('SIGTERM'));
+process.on('SIGINT', () => shutdown('SIGINT'));
 // this change is inserted to test git pushes - please delete later xxxysss
\ No newline at end of file
@@ -4,38 +4,39 @@ async function wait(ms) {
   return new Promise((resolve) => setTimeout(resolve, ms));
 }
 
-function getVectorStoreFilesClient() {
-  if (openai?.vectorStores?.files) {
-    return openai.vectorStores.files;
-  }
+// The SDK surface doesn't change at runtime, so resolve the vector store files
+// client and its call signatures once at load instead of on every call
+// (the indexing poll below would otherwise re-probe it every second)
+const vectorStoreFiles = openai?.vectorStores?.files || openai?.beta?.vectorStores?.files || null;
+const filesCreateTakesIds = typeof vectorStoreFiles?.create === 'function' && vectorStoreFiles.create.length >= 2;
+const filesRetrieveTakesIds = typeof vectorStoreFiles?.retrieve === 'function' && vectorStoreFiles.retrieve.length >= 2;
 
-  if (openai?.beta?.vectorStores?.files) {
-    return openai.beta.vectorStores.files;
+function getVectorStoreFilesClient() {
+  if (!vectorStoreFiles) {
+    throw new Error('OpenAI client does not support vector store files API');
   }
 
-  throw new Error('OpenAI client does not support vector store files API');
+  return vectorStoreFiles;
 }
 
 async function createVectorStoreFile(vectorStoreId, fileId) {
   const filesClient = getVectorStoreFilesClient();
-  const createFn = filesClient.create;
 
-  if (createFn.length >= 2) {
-    return createFn.call(filesClient, vectorStoreId, { file_id: fileId });
+  if (filesCreateTakesIds) {
+    return filesClient.create(vectorStoreId, { file_id: fileId });
   }
 
-  return createFn.call(filesClient, { vectorStoreId, fileId });
+  return filesClient.create({ vectorStoreId, fileId });
 }
 
 async function retrieveVectorStoreFile(vectorStoreId, fileId) {
   const filesClient = getVectorStoreFilesClient();
-  const retrieveFn = filesClient.retrieve;
 
-  if (retrieveFn.length >= 2) {
-    return retrieveFn.call(filesClient, vectorStoreId, fileId);
+  if (filesRetrieveTakesIds) {
+    return filesClient.retrieve(vectorStoreId, fileId);
   }
 
-  return retrieveFn.call(filesClient, { vectorStoreId, fileId });
+  return filesClient.retrieve({ vectorStoreId, fileId });
 }
 
 async function addFileToVectorStore({ vectorStoreId, fileId, timeoutMs = 120000 }) {
@@ -33,19 +33,20 @@ async function ensureTables() {
   tablesEnsured = true;
 }
 
+// Resolved once at load - the SDK surface doesn't change at runtime
+const vectorStores = openai?.vectorStores?.create
+  ? openai.vectorStores
+  : (openai?.beta?.vectorStores?.create ? openai.beta.vectorStores : null);
+
 async function createVectorStoreForThread(threadId) {
   const request = { name: `thread:${threadId}` };
 
-  let vectorStore;
-
-  if (openai?.vectorStores?.create) {
-    vectorStore = await openai.vectorStores.create(request);
-  } else if (openai?.beta?.vectorStores?.create) {
-    vectorStore = await openai.beta.vectorStores.create(request);
-  } else {
+  if (!vectorStores) {
     throw new Error('OpenAI client does not support vector store creation');
   }
 
+  const vectorStore = await vectorStores.create(request);
+
   if (!vectorStore?.id) {
     throw new Error('Failed to create vector store for thread');
   }